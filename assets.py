@@ -0,0 +1,104 @@
+import hashlib
+import os
+import tempfile
+
+import pygame
+
+from codegen import ui_scale
+
+# Images and sounds the games ship with, found relative to this directory
+# instead of one developer's Windows profile.
+#
+# Images are scaled to the display once with smoothscale, converted to the
+# display pixel format and kept in memory. The scaled copies also go to disk
+# under .assetcache/<width>x<height>/, so the next start-up on the same
+# screen loads a ready BMP (PNG for images with alpha) instead of decoding a
+# JPEG and scaling it again. Cache entries are named after the source's
+# path, mtime and size, so an edited asset is picked up.
+
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ASSET_DIR, '.assetcache')
+CACHE_VERSION = 1  # Bump when the scaling changes so old files are ignored
+
+
+def asset_path(*parts):
+    return os.path.join(ASSET_DIR, *parts)
+
+
+class AssetManager:
+    def __init__(self, screen_size, cache_dir=CACHE_DIR):
+        self.screen_size = tuple(screen_size)
+        self.scale = ui_scale(screen_size)  # Same factor the code generator uses
+        self.cache_dir = os.path.join(cache_dir, f"{self.screen_size[0]}x{self.screen_size[1]}")
+        self.surfaces = {}
+        self.disk_hits = 0
+        self.misses = 0
+
+    def scaled_size(self, size):
+        return (round(size[0] * self.scale), round(size[1] * self.scale))
+
+    def _convert(self, surface, alpha):
+        return surface.convert_alpha() if alpha else surface.convert()
+
+    def _cache_path(self, path, size, alpha):
+        stat = os.stat(path)
+        key = repr((CACHE_VERSION, os.path.abspath(path), stat.st_mtime_ns, stat.st_size, size, alpha))
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest()
+                            + ('.png' if alpha else '.bmp'))
+
+    def _load_cached(self, cache_path):
+        try:
+            return pygame.image.load(cache_path)
+        except (pygame.error, FileNotFoundError):
+            return None  # Missing or half-written file, scale again
+
+    def _store(self, cache_path, surface):
+        # Write to a temp file and rename, like the code cache
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=os.path.splitext(cache_path)[1])
+            os.close(fd)
+            pygame.image.save(surface, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except (OSError, pygame.error) as e:
+            print(f"Could not write asset cache entry {cache_path}: {e}")
+
+    def image(self, name, size=None, alpha=False):
+        # name scaled to size (default: its own size times the UI scale) in
+        # the display format; raises FileNotFoundError if the asset is missing
+        path = asset_path(name)
+        key = (path, size, alpha)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            return surface
+        # size=None is part of the key as it is: the natural size only changes with the file
+        cache_path = self._cache_path(path, size, alpha)
+        surface = self._load_cached(cache_path)
+        if surface is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            surface = pygame.image.load(path)
+            target = size or self.scaled_size(surface.get_size())
+            if surface.get_size() != target:
+                if surface.get_bitsize() < 24:
+                    surface = self._convert(surface, alpha)  # smoothscale needs 24 or 32 bit
+                surface = pygame.transform.smoothscale(surface, target)
+            self._store(cache_path, surface)
+        surface = self._convert(surface, alpha)
+        self.surfaces[key] = surface
+        return surface
+
+    def background(self, name):
+        # A full-screen background, or None when the file is not there
+        try:
+            return self.image(name, self.screen_size)
+        except FileNotFoundError:
+            print(f"Background {asset_path(name)} not found, using a plain background")
+            return None
+
+    def scale_surface(self, surface):
+        # A surface made at reference size (e.g. the START code) at the UI scale
+        if self.scale != 1.0:
+            surface = pygame.transform.smoothscale(surface, self.scaled_size(surface.get_size()))
+        return surface.convert_alpha()
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+import pygame
+
+from assets import ASSET_DIR
+from instrumentation import Histogram
+
+# Sound cues for the games. The mixer has to be configured before
+# pygame.init(), which otherwise opens it with SDL's default buffer; call
+# pre_init() first thing in main().
+#
+# Every cue is decoded to the mixer's PCM format once and kept on disk under
+# .audiocache/ as a NumPy array, so later start-ups skip MP3 decoding. Cues
+# play on channels reserved for their group: the feedback sounds can never be
+# crowded out, and a burst of key presses takes over the group's oldest
+# channel instead of being dropped when every channel is busy.
+#
+# pygame cannot tell when a sound actually leaves the speakers, so the
+# "key to sound estimate" metric is the measured play() call plus the length
+# of one mixer buffer, at the rate the mixer really runs at. get_init() does
+# not report the buffer size, so it is the one the mixer was opened with here.
+
+FREQUENCY = 44100
+SAMPLE_SIZE = -16
+CHANNELS = 2
+BUFFER = 512  # Samples per mixer buffer, about 12 ms at 44.1 kHz
+MIXER_CHANNELS = 32
+CACHE_DIR = os.path.join(ASSET_DIR, '.audiocache')
+GROUP_CHANNELS = {"feedback": 2, "keys": 16}  # Reserved in this order from channel 0
+
+
+mixer_buffer = None  # Samples per buffer the mixer was opened with, if opened here
+
+
+def pre_init(buffer=BUFFER):
+    global mixer_buffer
+    pygame.mixer.pre_init(FREQUENCY, SAMPLE_SIZE, CHANNELS, buffer)
+    mixer_buffer = buffer
+
+
+class Cue:
+    # What Game.play() and the scripts hold on to; plays through the engine
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+
+    def play(self):
+        self.engine.play(self.name)
+
+
+class AudioEngine:
+    def __init__(self, instruments=None, cache_dir=CACHE_DIR, groups=GROUP_CHANNELS):
+        global mixer_buffer
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(buffer=mixer_buffer or BUFFER)
+            mixer_buffer = mixer_buffer or BUFFER
+        self.frequency, self.format, self.channel_count = pygame.mixer.get_init()
+        self.cache_dir = cache_dir
+        self.sounds = {}
+        self.groups = {}  # cue name -> group name
+        pygame.mixer.set_num_channels(max(MIXER_CHANNELS, sum(groups.values())))
+        pygame.mixer.set_reserved(sum(groups.values()))
+        self.channels = {}
+        first = 0
+        for group, count in groups.items():
+            self.channels[group] = [pygame.mixer.Channel(first + i) for i in range(count)]
+            first += count
+        self.next_channel = dict.fromkeys(groups, 0)
+        # What a cue takes to reach the speakers, estimated as the play call plus
+        # one mixer buffer; unknown if something else opened the mixer
+        self.buffer_ms = mixer_buffer * 1000 / self.frequency if mixer_buffer else 0.0
+        self.latency = (instruments.histogram("key to sound estimate") if instruments is not None
+                        else Histogram())
+
+    def _cache_path(self, path):
+        stat = os.stat(path)
+        key = repr((os.path.abspath(path), stat.st_mtime_ns, stat.st_size, self.frequency, self.format,
+                    self.channel_count))
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+
+    def _decode(self, path):
+        cache_path = self._cache_path(path)
+        try:
+            return pygame.sndarray.make_sound(np.load(cache_path))
+        except (OSError, ValueError):
+            pass  # Not cached yet or half written
+        sound = pygame.mixer.Sound(path)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                np.save(file, pygame.sndarray.array(sound))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not write audio cache entry {cache_path}: {e}")
+        return sound
+
+    def load(self, name, path, group, volume=1.0):
+        return self.add(name, self._decode(path), group, volume)
+
+    def add(self, name, sound, group, volume=1.0):
+        # A Sound made in memory, e.g. by synth.make_sound
+        sound.set_volume(volume)
+        self.sounds[name] = sound
+        self.groups[name] = group
+        return Cue(self, name)
+
+    def play(self, name):
+        start = time.perf_counter()
+        channels = self.channels[self.groups[name]]
+        channel = next((channel for channel in channels if not channel.get_busy()), None)
+        if channel is None:
+            # All busy: cut off the one whose turn it is, round robin
+            group = self.groups[name]
+            channel = channels[self.next_channel[group]]
+            self.next_channel[group] = (self.next_channel[group] + 1) % len(channels)
+        channel.play(self.sounds[name])
+        self.latency.observe((time.perf_counter() - start) * 1000 + self.buffer_ms)
+
+    def play_music(self, path, volume):
+        # Long tracks stream from the file instead of being decoded up front
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.set_volume(volume)
+        pygame.mixer.music.play(-1)
@@ -0,0 +1,108 @@
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+import codegen
+from codecache import ImageCache
+from damage import FLIP_LEFT_RIGHT, damage_batch, stack_images, unstack_images
+
+# Compares the old per-image PIL damage chain with damage.damage_batch, then
+# a whole damaged round: the old reset_game (encode, then blur, noise, flip,
+# resize and rotate at the encoder's resolution, one code at a time) against
+# codegen.build_round with fresh payloads (cold) and with cached bitmaps (warm).
+# Run with: python benchmarks/bench_damage.py [codes] [iterations]
+
+
+def legacy_damage(img):
+    # blur, noise, flip, resize and rotate, one image at a time
+    img = img.filter(ImageFilter.GaussianBlur(radius=2))
+    noise = np.random.randint(0, 100, (img.height, img.width), dtype='uint8')
+    img = Image.blend(img, Image.fromarray(noise, mode='L').convert(img.mode), 0.2)
+    img = img.transpose(Image.FLIP_LEFT_RIGHT)
+    img = img.resize((100, 100), Image.LANCZOS)
+    return img.rotate(random.uniform(-30, 30), expand=True, fillcolor=(255, 255, 255, 0))
+
+def legacy_encode(name, data):
+    # The encoders as the old generate_* functions called them
+    if name == 'aztec':
+        import pyqrcode
+        buffer = io.BytesIO()
+        pyqrcode.create(data, error='L', version=1, mode='binary').png(buffer, scale=10)
+        buffer.seek(0)
+        return Image.open(buffer).convert('RGBA')
+    return codegen.encode_datamatrix(data)
+
+def legacy_round_code(name, data):
+    img = legacy_encode(name, data)
+    img = img.filter(ImageFilter.GaussianBlur(radius=2))
+    noise = np.random.randint(0, 100, (img.height, img.width), dtype='uint8')
+    img = Image.blend(img, Image.fromarray(noise, mode='L').convert(img.mode), 0.2)
+    img = img.transpose(Image.FLIP_TOP_BOTTOM if name == 'aztec' else Image.FLIP_LEFT_RIGHT)
+    img = img.resize((100, 100), Image.LANCZOS)
+    return img.rotate(random.uniform(-30, 30), expand=True, fillcolor=(255, 255, 255, 0))
+
+def median_ms(function, iterations, setup=lambda i: ()):
+    timings = []
+    for i in range(iterations):
+        args = setup(i)
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+def bench_round(count, iterations):
+    # One 2D symbology throughout, datamatrix if libdmtx is there
+    try:
+        codegen.encode_datamatrix("0")
+        name = 'datamatrix'
+    except ImportError:
+        name = 'aztec'
+    codegen.image_cache = ImageCache(tempfile.mkdtemp(prefix="codecache-"))
+    types = [name] * count
+    legacy = median_ms(lambda: [legacy_round_code(name, codegen.generate_code()) for _ in range(count)], iterations)
+    cold = median_ms(lambda seed: codegen.build_round(codegen.REFERENCE_SIZE, count, True, seed=seed, code_types=types),
+                     iterations, setup=lambda i: (i,))
+    codegen.build_round(codegen.REFERENCE_SIZE, count, True, seed=0, code_types=types)
+    warm = median_ms(lambda: codegen.build_round(codegen.REFERENCE_SIZE, count, True, seed=0, code_types=types),
+                     iterations)
+    print(f"{count}-code damaged {name} round, median of {iterations} runs")
+    print(f"old reset_game          {legacy:8.2f} ms")
+    print(f"build_round cold        {cold:8.2f} ms  ({legacy / cold:.1f}x)")
+    print(f"build_round warm        {warm:8.2f} ms  ({legacy / warm:.1f}x)")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    # Random module patterns stand in for encoded 2D codes
+    modules = np.random.default_rng(0).integers(0, 2, size=(count, 20, 20))
+    grey = np.where(modules, 0, 255).astype(np.uint8).repeat(5, axis=1).repeat(5, axis=2)
+    images = [Image.fromarray(code, mode='L').convert('RGBA') for code in grey]
+    rng = np.random.default_rng(1)
+
+    legacy = median_ms(lambda: [legacy_damage(img) for img in images], iterations)
+    batch = median_ms(lambda: damage_batch(stack_images(images), rng, flips=FLIP_LEFT_RIGHT), iterations)
+    batch_images = median_ms(lambda: unstack_images(damage_batch(stack_images(images), rng, flips=FLIP_LEFT_RIGHT)), iterations)
+
+    first = damage_batch(stack_images(images), 1234, flips=FLIP_LEFT_RIGHT)
+    second = damage_batch(stack_images(images), 1234, flips=FLIP_LEFT_RIGHT)
+
+    print(f"{count} codes, median of {iterations} runs")
+    print(f"legacy PIL chain        {legacy:8.2f} ms")
+    print(f"damage_batch            {batch:8.2f} ms")
+    print(f"damage_batch to PIL     {batch_images:8.2f} ms")
+    print(f"reproducible from seed  {bool((first == second).all())}")
+    print()
+    bench_round(count, max(3, iterations // 20))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Headless benchmark suite: runs under SDL's dummy video and audio drivers and
+# writes machine-readable results, so two versions can be compared.
+#
+#   python benchmarks/bench_game.py --output before.json
+#   python benchmarks/bench_game.py --output after.json --compare before.json
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pygame
+
+import codegen
+import symbologies
+from codecache import ImageCache
+from game import GAME_OVER, GAME_RUNNING, GREEN, GREEN_SCREEN_DURATION, SHOW_LEADERBOARD, START_SCREEN, Game
+from leaderboard import Leaderboard
+from renderer import Renderer
+from surfaces import SurfacePool, pil_to_surface
+
+SCREEN_SIZE = (1920, 1080)
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def measure(name, function, iterations, setup=None):
+    # Times iterations calls, then repeats a few under tracemalloc for the peak
+    # Python-side allocation per call (kept apart so tracing does not skew timings)
+    timings = []
+    for i in range(iterations):
+        argument = setup(i) if setup else None
+        start = time.perf_counter()
+        function(argument) if setup else function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    traced = min(iterations, 20)
+    peak_bytes = 0
+    tracemalloc.start()
+    for i in range(traced):
+        argument = setup(iterations + i) if setup else None
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        function(argument) if setup else function()
+        peak_bytes += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    timings.sort()
+    result = {
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 0.50),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+        "mean_ms": sum(timings) / len(timings),
+        "peak_alloc_bytes": peak_bytes // traced,
+    }
+    print(f"{name:<34}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}{result['p99_ms']:>9.3f}"
+          f"{result['peak_alloc_bytes']:>12}")
+    return result
+
+def payload(index):
+    return f"{index:012d}"
+
+def bench_startup(results, iterations):
+    # Cold import of each game script in a fresh interpreter; nothing should
+    # run until main(), and the encoder libraries should not load at all
+    for module in ("tradeshow", "tradeShowPictures"):
+        command = [sys.executable, "-c", f"import {module}"]
+        label = f"import {module}"
+        results[label] = measure(label, lambda: subprocess.run(command, cwd=ROOT, check=True), iterations)
+
+def bench_generators(results, iterations):
+    generators = {
+        "generate_datamatrix": codegen.generate_datamatrix,
+        "generate_aztec_code": codegen.generate_aztec_code,
+        "generate_pdf417": codegen.generate_pdf417,
+        "generate_barcode": codegen.generate_barcode,
+        "generate_upcean": codegen.generate_upcean,
+        "generate_msi": codegen.generate_msi,
+    }
+    if not symbologies.get('msi').available():
+        # generate_msi would fall back to code128, measuring generate_barcode again
+        print(f"{'generate_msi':<34}skipped: python-barcode has no MSI")
+        del generators["generate_msi"]
+    for number, (name, generate) in enumerate(generators.items()):
+        for damaged in (False, True):
+            label = f"{name}{' damaged' if damaged else ''}"
+            # Unique payloads miss the code cache, a fixed one always hits it.
+            # Every pass has its own payload range, so none reuses another's bitmaps.
+            first = number * 10 ** 7 + (10 ** 6 if damaged else 0)
+            try:
+                results[label + " cold"] = measure(label + " cold", lambda data: generate(data, damaged=damaged),
+                                                   iterations, setup=lambda i: payload(first + i))
+                generate("000000000042", damaged=damaged)  # Fill the cache first
+                results[label + " cached"] = measure(label + " cached", lambda: generate("000000000042", damaged=damaged),
+                                                     iterations)
+            except Exception as e:
+                print(f"{label:<34}skipped: {e}")
+
+def bench_conversion(results, iterations):
+    image = codegen.generate_aztec_code("000000000042")
+    results["pil_to_surface"] = measure("pil_to_surface", lambda: pil_to_surface(image), iterations)
+    pool = SurfacePool()
+
+    def pooled():
+        pool.release([pil_to_surface(image, pool)])
+    results["pil_to_surface pooled"] = measure("pil_to_surface pooled", pooled, iterations)
+
+def bench_rounds(results, iterations):
+    pool = SurfacePool()
+    for damaged in (False, True):
+        surfaces = []
+
+        def reset(seed):
+            # What reset_game does once the round pool has a round ready,
+            # plus the building itself that now runs in the background
+            next_round = codegen.build_round(SCREEN_SIZE, codegen.CODE_COUNT, damaged, seed=seed)
+            pool.release(surfaces)
+            surfaces[:] = [pil_to_surface(image, pool) for image in next_round["images"]]
+
+        label = f"reset_game {'damaged' if damaged else 'clean'}"
+        # Seeds of their own, or the damaged pass finds the clean pass's bitmaps cached
+        results[label] = measure(label, reset, iterations, setup=lambda i: i + (10 ** 6 if damaged else 0))
+
+def bench_leaderboard(results, iterations):
+    # A full trade-show day already on the board, then more finishes and lookups
+    leaderboard = Leaderboard(os.path.join(tempfile.mkdtemp(prefix="leaderboard-"), "leaderboard.db"))
+    rng = np.random.default_rng(0)
+    with leaderboard.connection:
+        leaderboard.connection.executemany("INSERT INTO runs (name, time, finished) VALUES (?, ?, 0)",
+                                           [(f"Player {i % 500}", float(t)) for i, t in enumerate(rng.uniform(15, 90, 5000))])
+    leaderboard = Leaderboard(leaderboard.path)
+    results["leaderboard add"] = measure("leaderboard add", lambda t: leaderboard.add("Bench", t), iterations,
+                                         setup=lambda i: 15 + i % 75)
+    results["leaderboard top"] = measure("leaderboard top", lambda: leaderboard.top(), iterations * 10)
+    results["leaderboard rank"] = measure("leaderboard rank", lambda: leaderboard.rank(42.0), iterations * 10)
+    leaderboard.close()
+
+def bench_frames(results, frames):
+    # Drives the real Game.draw, with the state set directly instead of typed in
+    screen = pygame.display.get_surface()
+    font = pygame.font.Font(None, 32)
+    large_font = pygame.font.Font(None, 48)
+    background = pygame.Surface(SCREEN_SIZE).convert()
+    background.fill((40, 90, 160))
+    renderer = Renderer(screen, background, fps=0)  # No cap, measure raw frame cost
+    round_data = codegen.build_round(SCREEN_SIZE, codegen.CODE_COUNT, seed=0)
+    code_images = [pil_to_surface(image) for image in round_data["images"]]
+    start_button = pil_to_surface(codegen.generate_datamatrix("START"))
+    leaderboard = Leaderboard(os.path.join(tempfile.mkdtemp(prefix="leaderboard-"), "leaderboard.db"))
+    for i in range(10):
+        leaderboard.add(f"Player {i}", 20.0 + i)
+    game = Game(SCREEN_SIZE, font, large_font, start_button,
+                lambda: (round_data["codes"], round_data["positions"], code_images), leaderboard,
+                background=background)
+    game.start_round()
+    game.end_time = game.start_time + 42.0
+    typed = "0123456789012"
+
+    def start_screen(i):
+        game.game_state = START_SCREEN
+        game.input_text = "START"[:i % 6]
+        game.draw(renderer)
+        renderer.present()
+
+    def game_running(i):
+        game.game_state = GAME_RUNNING
+        game.code_index = (i // 13) % len(code_images)
+        if i % 13 == 0:
+            game.effects.flash(GREEN, GREEN_SCREEN_DURATION)
+            game.effects.pop()
+        game.input_text = typed[:i % 13]
+        game.draw(renderer)
+        renderer.present()
+
+    def game_over(i):
+        game.game_state = GAME_OVER
+        game.name_input = "Player"[:i % 7]
+        game.draw(renderer)
+        renderer.present()
+
+    def show_leaderboard(i):
+        game.game_state = SHOW_LEADERBOARD
+        game.draw(renderer)
+        renderer.present()
+
+    for name, frame in [("frame START_SCREEN", start_screen), ("frame GAME_RUNNING", game_running),
+                        ("frame GAME_OVER", game_over), ("frame SHOW_LEADERBOARD", show_leaderboard)]:
+        renderer.invalidate()
+        results[name] = measure(name, frame, frames, setup=lambda i: i)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, previous_path):
+    with open(previous_path) as file:
+        previous = json.load(file)["results"]
+    print(f"\nchange in p50 against {previous_path}")
+    for name, result in results.items():
+        if name in previous and previous[name]["p50_ms"]:
+            ratio = result["p50_ms"] / previous[name]["p50_ms"]
+            flag = "  REGRESSION" if ratio > 1.2 else ""
+            print(f"{name:<34}{ratio:>8.2f}x{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the tradeshow games")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode(SCREEN_SIZE)
+    # A throwaway cache directory, so "cold" numbers really are cold
+    codegen.image_cache = ImageCache(tempfile.mkdtemp(prefix="codecache-"))
+
+    print(f"{'benchmark':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'bytes/op':>12}")
+    results = {}
+    bench_startup(results, max(1, args.iterations // 5))
+    bench_generators(results, args.iterations)
+    bench_conversion(results, args.iterations * 10)
+    bench_rounds(results, args.iterations)
+    bench_leaderboard(results, args.iterations)
+    bench_frames(results, args.frames)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nwrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+from PIL import Image
+
+from surfaces import SurfacePool, array_to_surface, pil_to_surface
+
+# Micro-benchmark for PIL/NumPy -> pygame surface conversion.
+# Run with: python benchmarks/bench_surfaces.py [size] [iterations]
+
+
+def legacy_pil_to_surface(pil_image):
+    # The conversion the game scripts used before surfaces.py
+    mode = pil_image.mode
+    size = pil_image.size
+    data = pil_image.tobytes()
+    image = Image.frombytes(mode, size, data)
+    image = image.convert("RGBA")
+    raw_str = image.tobytes("raw", "RGBA")
+    return pygame.image.fromstring(raw_str, size, "RGBA")
+
+def measure(convert, source, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        convert(source)
+        timings.append(time.perf_counter() - start)
+
+    # Peak Python-side memory for a single conversion. PIL's tobytes() buffers
+    # show up here, SDL's own surface memory does not.
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    surface = convert(source)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    del surface
+    timings.sort()
+    return timings[len(timings) // 2], peak
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 142
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    pygame.display.init()
+    pygame.display.set_mode((640, 480))
+
+    array = np.random.randint(0, 256, (size, size, 4), dtype=np.uint8)
+    pil_image = Image.fromarray(array, mode="RGBA")
+    pool = SurfacePool()
+
+    def pooled_pil(image):
+        surface = pil_to_surface(image, pool)
+        pool.release([surface])
+        return surface
+
+    def pooled_array(image_array):
+        surface = array_to_surface(image_array, pool)
+        pool.release([surface])
+        return surface
+
+    cases = [
+        ("legacy pil_to_surface", legacy_pil_to_surface, pil_image),
+        ("pil_to_surface", pil_to_surface, pil_image),
+        ("pil_to_surface + pool", pooled_pil, pil_image),
+        ("array_to_surface", array_to_surface, array),
+        ("array_to_surface + pool", pooled_array, array),
+    ]
+    # Peak memory in images' worth: how many full-size pixel buffers a
+    # conversion holds at once on the Python side
+    image_bytes = array.nbytes
+    print(f"{size}x{size} RGBA, {iterations} iterations")
+    print(f"{'path':<26}{'median us':>10}{'peak bytes':>12}{'x image':>9}")
+    for name, convert, source in cases:
+        median, peak = measure(convert, source, iterations)
+        print(f"{name:<26}{median * 1e6:>10.1f}{peak:>12}{peak / image_bytes:>9.1f}")
+    print(f"surfaces allocated by the pool: {pool.allocated}")
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import codegen
+import symbologies
+from decoders import can_verify, verify
+
+# Offline calibration of the damage parameters. For every symbology that has
+# a reader, each cell of a blur x noise x rotation grid is used to damage
+# SAMPLES random codes, exactly like build_round does, and the result is read
+# back. Cells that (nearly) always decode are ranked by how much damage they
+# do and spread over DIFFICULTY_LEVELS levels:
+#
+#   python calibrate.py --samples 64
+#
+# writes calibration.json, which build_round(difficulty=...) uses.
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibration.json')
+DIFFICULTY_LEVELS = 3
+SAMPLES = 32
+MIN_DECODE_RATE = 0.98  # A cell is usable if at least this share of its samples decode
+
+BLUR_SIGMAS = (0.0, 0.5, 1.0, 1.5, 2.0, 3.0)
+NOISE_LEVELS = (0.0, 0.1, 0.2, 0.3, 0.4)
+MAX_ANGLES = (0, 10, 20, 30, 45)
+
+
+def damage_score(params):
+    # How hard a cell is on the eye, 0 (clean) to 3 (strongest on every axis)
+    return (params["blur_sigma"] / max(BLUR_SIGMAS) + params["noise_level"] / max(NOISE_LEVELS)
+            + params["max_angle"] / max(MAX_ANGLES))
+
+def grid():
+    return [{"blur_sigma": blur_sigma, "noise_level": noise_level, "max_angle": max_angle}
+            for blur_sigma, noise_level, max_angle in itertools.product(BLUR_SIGMAS, NOISE_LEVELS, MAX_ANGLES)]
+
+def measure_cell(name, params, samples, seed):
+    # Worker side: share of samples that still decode with these parameters
+    rng = np.random.default_rng(seed)
+    symbology = symbologies.get(name)
+    codes = [symbology.payload(''.join(rng.choice(list('0123456789'), 12))) for _ in range(samples)]
+    clean = [codegen.render_clean(name, code, store=False) for code in codes]
+    # The damaged path of build_round, without its read-back
+    images = codegen.damage_group(clean, [symbology] * samples, codes, rng, True, symbology.rotate, params,
+                                  verify_codes=False)
+    decoded = sum(verify(name, image, code) for image, code in zip(images, codes))
+    return decoded / samples
+
+def pick_levels(cells, levels=DIFFICULTY_LEVELS):
+    # cells: [(params, rate)]. Usable cells sorted by damage; level 1 is the
+    # mildest, the last level the strongest that still decodes
+    usable = sorted(((params, rate) for params, rate in cells if rate >= MIN_DECODE_RATE),
+                    key=lambda cell: damage_score(cell[0]))
+    table = {}
+    for level in range(1, levels + 1):
+        if usable:
+            params, rate = usable[round((level - 1) / max(levels - 1, 1) * (len(usable) - 1))]
+            table[str(level)] = dict(params, decode_rate=rate)
+    return table
+
+def calibrate(names=None, samples=SAMPLES, workers=None, seed=0):
+    names = names or [symbology.name for symbology in symbologies.available_symbologies()]
+    names = [name for name in names if can_verify(name)]
+    tasks = [(name, params) for name in names for params in grid()]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=codegen.seed_worker) as executor:
+        rates = list(executor.map(measure_cell, [name for name, _ in tasks], [params for _, params in tasks],
+                                  [samples] * len(tasks), seeds))
+    table = {}
+    for name in names:
+        cells = [(params, rate) for (task_name, params), rate in zip(tasks, rates) if task_name == name]
+        table[name] = pick_levels(cells)
+        print(f"{name}: {sum(rate >= MIN_DECODE_RATE for _, rate in cells)} of {len(cells)} cells decode")
+    return table
+
+def save_calibration(table, path=CALIBRATION_FILE):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(table, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def load_calibration(path=CALIBRATION_FILE):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description="Find damage parameters that keep codes readable")
+    parser.add_argument("--samples", type=int, default=SAMPLES, help="codes per grid cell")
+    parser.add_argument("--symbology", action="append", help="only these (default: all with a reader)")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", default=CALIBRATION_FILE)
+    args = parser.parse_args()
+    table = calibrate(args.symbology, args.samples, args.workers)
+    if not table:
+        print("No symbology could be verified, install pylibdmtx and/or pyzbar")
+        return
+    save_calibration(table, args.output)
+    print(f"wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
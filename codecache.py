@@ -0,0 +1,95 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from PIL import Image
+
+# Content-addressed cache for clean, encoded code bitmaps. Entries are looked up
+# in a bounded in-memory LRU first, then on disk as PNG files named after the
+# hash of their key. A key is any tuple of plain values, e.g.
+# ("datamatrix", "START", (100, 100), 0, 0). Only images that come back, like
+# START, belong on disk: the disk cache has no size limit, so one-off images
+# are kept in memory only (store=False).
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.codecache')
+CACHE_VERSION = 2  # Bump when the rendering changes so old files are ignored
+MEMORY_ENTRIES = 512
+
+
+class ImageCache:
+    def __init__(self, directory=CACHE_DIR, max_entries=MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key_hash(self, key):
+        return hashlib.sha1(repr((CACHE_VERSION,) + tuple(key)).encode('utf-8')).hexdigest()
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + '.png')
+
+    def _remember(self, digest, image):
+        self.memory[digest] = image
+        self.memory.move_to_end(digest)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _load(self, path):
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img
+        except (OSError, ValueError):
+            return None  # Missing or half-written file, render again
+
+    def _store(self, path, image):
+        # Write to a temp file and rename, so other workers never see a partial PNG
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                image.save(file, format='PNG')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write code cache entry {path}: {e}")
+
+    def lookup(self, key):
+        # The cached image for key, or None; memory first, then disk
+        digest = self.key_hash(key)
+        image = self.memory.get(digest)
+        if image is not None:
+            self.memory.move_to_end(digest)
+            self.hits += 1
+            return image
+        image = self._load(self.path_for(digest))
+        if image is not None:
+            self.disk_hits += 1
+            self._remember(digest, image)
+        return image
+
+    def put(self, key, image, store=True):
+        # store=False when another process already wrote the file
+        digest = self.key_hash(key)
+        if store:
+            self._store(self.path_for(digest), image)
+        self._remember(digest, image)
+
+    def get(self, key, render, store=True):
+        # Returns the cached image for key, calling render() only on a miss.
+        # Callers get the shared image object and must not modify it in place.
+        image = self.lookup(key)
+        if image is None:
+            self.misses += 1
+            image = render()
+            self.put(key, image, store)
+        return image
+
+    def clear_memory(self):
+        self.memory.clear()
+
+
+image_cache = ImageCache()
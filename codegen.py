@@ -0,0 +1,304 @@
+import random
+from PIL import Image, ImageFilter
+import numpy as np
+from codecache import image_cache
+import symbologies
+from damage import (FLIP_NONE, FLIP_LEFT_RIGHT, FLIP_TOP_BOTTOM, MAX_ANGLE, canvas_size, damage_batch, stack_images,
+                    unstack_images)
+from placement import place
+
+# Code generation for the typing game. Nothing in here touches pygame, so the
+# functions can run in worker processes while the game loop keeps drawing.
+# The encoder libraries are imported on first use: most start-ups only need
+# the START code, and that comes out of the image cache.
+
+CODE_COUNT = 10
+
+CODE_WIDTH = 100  # Reduced width for the codes
+
+CODE_WIDTH_1D = 100  # Height for 1D codes
+CODE_WIDTH_2D = 100  # Height for 2D codes
+
+CODE_HEIGHT = 100  # Reduced height for the codes
+
+CODE_HEIGHT_1D = 50  # Height for 1D codes
+CODE_HEIGHT_2D = 100  # Height for 2D codes
+
+MARGIN = 50  # Margin to ensure codes are within the field of view
+
+# The sizes above are for a 1080p screen; larger screens scale codes and layout up
+REFERENCE_SIZE = (1920, 1080)
+
+# Room kept free under every code in field rounds for the text the game writes
+# there. The game's font does not grow with the screen, so neither does this.
+LABEL_WIDTH = 180
+LABEL_HEIGHT = 40
+# A crowded field round shrinks its codes, in FIELD_SHRINK steps, down to this
+MIN_FIELD_SCALE = 0.25
+FIELD_SHRINK = 0.9
+
+ROUND_BUDGET_MS = 250  # Encode time a round may spend on cache misses
+VERIFY_ATTEMPTS = 3  # Re-damage tries for a code that does not read back
+
+
+def seed_worker():
+    # Forked workers inherit the parent's random state, reseed so every round differs
+    random.seed()
+    np.random.seed()
+
+def ui_scale(screen_size):
+    # Never below 1, codes are calibrated to read back at their reference size
+    return max(1.0, min(screen_size[0] / REFERENCE_SIZE[0], screen_size[1] / REFERENCE_SIZE[1]))
+
+def scale_image(image, scale):
+    if scale == 1.0:
+        return image
+    return image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+
+def trim(image):
+    # Cropped to its visible pixels
+    if 'A' not in image.getbands():
+        return image
+    box = image.getchannel('A').getbbox()
+    return image.crop(box) if box and box != (0, 0) + image.size else image
+
+def generate_code(rng=None):
+    if rng is None:
+        return ''.join(random.choices('0123456789', k=12))  # Generate 12 digits
+    return ''.join(map(str, rng.integers(0, 10, 12)))
+
+def new_seed():
+    return random.getrandbits(63)
+
+def encode_datamatrix(data):
+    from pylibdmtx.pylibdmtx import encode as dmtx_encode
+    dmtx = dmtx_encode(data.encode('utf-8'))
+    img = Image.frombytes('RGB', (dmtx.width, dmtx.height), dmtx.pixels)
+    return img.convert('RGBA')
+
+def encode_aztec_code(data):
+    import pyqrcode
+    qr = pyqrcode.create(data, error='L', version=1, mode='binary')
+    # Same pixels as qr.png(scale=10), without the PNG encode/decode round trip
+    modules = np.pad(np.array(qr.code, dtype=np.uint8), 4)  # 4 module quiet zone
+    pixels = np.where(modules, 0, 255).astype(np.uint8).repeat(10, axis=0).repeat(10, axis=1)
+    return Image.fromarray(pixels, mode='L').convert('RGBA')
+
+def encode_pdf417(data):
+    import pdf417gen
+    codes = pdf417gen.encode(data, columns=5)  # Example adjustment, change columns as needed
+    return pdf417gen.render_image(codes).convert('RGBA')
+
+def encode_barcode(data, barcode_type='code128'):
+    import barcode
+    from barcode.writer import ImageWriter
+    barcode_class = barcode.get_barcode_class(barcode_type)
+    code = barcode_class(data, writer=ImageWriter())
+    barcode_image = code.render(writer_options={"module_width": 0.5, "module_height": 50, "quiet_zone": 2})
+    return barcode_image.convert('RGBA')
+
+def barcode_available(barcode_type):
+    def available():
+        import barcode
+        try:
+            barcode.get_barcode_class(barcode_type)
+            return True
+        except barcode.errors.BarcodeNotFoundError:
+            return False
+    return available
+
+symbologies.register('datamatrix', encode_datamatrix, (CODE_WIDTH, CODE_HEIGHT), weight=30, flip=FLIP_LEFT_RIGHT)
+symbologies.register('aztec', encode_aztec_code, (CODE_WIDTH, CODE_HEIGHT), flip=FLIP_TOP_BOTTOM,
+                     validate=lambda data: 0 < len(data.encode('utf-8')) <= 17)  # QR version 1-L capacity
+symbologies.register('code128', encode_barcode, (CODE_WIDTH_1D, CODE_HEIGHT_1D), flip=FLIP_LEFT_RIGHT, rotate=False,
+                     validate=lambda data: bool(data) and all(32 <= ord(c) < 127 for c in data))
+symbologies.register('pdf417', encode_pdf417, (CODE_WIDTH_1D, CODE_HEIGHT_1D), flip=FLIP_TOP_BOTTOM)
+symbologies.register('upcean', lambda data: encode_barcode(data, 'ean13'), (CODE_WIDTH_1D, CODE_HEIGHT_1D),
+                     flip=FLIP_LEFT_RIGHT, rotate=False, validate=symbologies.is_ean13, payload=symbologies.ean13_payload)
+symbologies.register('msi', lambda data: encode_barcode(data, 'msi'), (CODE_WIDTH_1D, CODE_HEIGHT_1D),
+                     flip=FLIP_TOP_BOTTOM, rotate=False, validate=str.isdigit, available=barcode_available('msi'))
+
+PIL_FLIPS = {FLIP_LEFT_RIGHT: Image.FLIP_LEFT_RIGHT, FLIP_TOP_BOTTOM: Image.FLIP_TOP_BOTTOM}
+
+def render_clean(name, data, damaged=False, store=True):
+    # The deterministic part of every generator: encode, blur, flip and resize.
+    # The result only depends on its arguments, so it is cached, on disk too
+    # unless store is False (random round payloads that never come back).
+    symbology = symbologies.get(name)
+    blur_radius = 2 if damaged else 0
+    flip = symbology.flip if damaged else FLIP_NONE
+
+    def render():
+        img = symbology.measured_encode(data)
+        if blur_radius:
+            img = img.filter(ImageFilter.GaussianBlur(radius=blur_radius))  # Gaussian blur
+        if flip != FLIP_NONE:
+            img = img.transpose(PIL_FLIPS[flip])  # Horizontal or vertical flip
+        return img.resize(symbology.size, Image.LANCZOS)
+
+    return image_cache.get((name, data, symbology.size, blur_radius, flip), render, store)
+
+def finish_image(img, damaged, rotate=True):
+    # Per-instance noise and rotation, cheap enough to run on every cache hit.
+    # Blur and flip are already part of the cached image.
+    if not (damaged or rotate):
+        return img.copy()  # Never hand out the cached image itself
+    batch = damage_batch(stack_images([img]), damaged=damaged, blur_sigma=0,
+                         max_angle=MAX_ANGLE if rotate else 0)
+    return unstack_images(batch)[0]
+
+def generate(name, data, damaged=False):
+    img = render_clean(name, data, damaged)
+    return finish_image(img, damaged, symbologies.get(name).rotate)
+
+def generate_datamatrix(data, damaged=False):
+    return generate('datamatrix', data, damaged)
+
+def generate_aztec_code(data, damaged=False):
+    return generate('aztec', data, damaged)
+
+def generate_pdf417(data, damaged=False):
+    return generate('pdf417', data, damaged)
+
+def generate_barcode(data, barcode_type='code128', damaged=False):
+    if barcode_type not in symbologies.registry:
+        symbologies.register(barcode_type, lambda payload: encode_barcode(payload, barcode_type),
+                             (CODE_WIDTH_1D, CODE_HEIGHT_1D), weight=0, flip=FLIP_LEFT_RIGHT, rotate=False)
+    return generate(barcode_type, data, damaged)
+
+def generate_upcean(data, damaged=False):
+    # Accepts the 12 data digits or the full 13 digits with check digit
+    if len(data) == 12:
+        data = symbologies.ean13_payload(data)
+    return generate('upcean', data, damaged)
+
+def generate_msi(data, damaged=False):
+    if not symbologies.get('msi').available():
+        print(f"Barcode type 'msi' is not supported. Generating default barcode instead.")
+        return generate_barcode(data, damaged=damaged)
+    return generate('msi', data, damaged)
+
+def calibrated_damage(difficulty):
+    # name -> damage_batch parameters for a difficulty level, from calibrate.py
+    from calibrate import load_calibration
+    damage = {}
+    for name, levels in load_calibration().items():
+        params = levels.get(str(difficulty))
+        if params and name in symbologies.registry:
+            damage[name] = {key: params[key] for key in ("blur_sigma", "noise_level", "max_angle")}
+    return damage
+
+def damage_group(clean_images, chosen, codes, rng, damaged, rotate, params, verify_codes):
+    # One damage_batch for codes that share size, rotation and parameters. With
+    # verify_codes, codes the reader cannot get back are damaged again, and
+    # after VERIFY_ATTEMPTS they are shown clean.
+    from decoders import can_verify, verify
+    max_angle = params.get("max_angle", MAX_ANGLE) if rotate else 0
+    kwargs = {key: value for key, value in params.items() if key != "max_angle"}
+    flips = np.array([symbology.flip for symbology in chosen])
+    images = unstack_images(damage_batch(stack_images(clean_images), rng, damaged=damaged, flips=flips,
+                                         max_angle=max_angle, **kwargs))
+    if not (damaged and verify_codes):
+        return images
+    for i, symbology in enumerate(chosen):
+        if not can_verify(symbology.name):
+            continue
+        for _ in range(VERIFY_ATTEMPTS):
+            if verify(symbology.name, images[i], codes[i]):
+                break
+            images[i] = unstack_images(damage_batch(stack_images([clean_images[i]]), rng, damaged=True,
+                                                    flips=symbology.flip, max_angle=max_angle, **kwargs))[0]
+        else:
+            images[i] = unstack_images(damage_batch(stack_images([clean_images[i]]), rng, damaged=False,
+                                                    max_angle=max_angle))[0]
+    return images
+
+def field_area(screen_size):
+    margin = round(MARGIN * ui_scale(screen_size))
+    return margin, margin, screen_size[0] - 2 * margin, screen_size[1] - 2 * margin
+
+def field_boxes(sizes, scale):
+    # What a field round keeps apart: each code at scale with its label under it
+    return [(max(round(width * scale), LABEL_WIDTH), round(height * scale) + LABEL_HEIGHT) for width, height in sizes]
+
+def place_field(sizes, area, rng, scale):
+    # (scale, positions) for codes of the given reference sizes: the largest
+    # scale up to scale at which they all fit, shrinking first until their
+    # boxes cover no more than the area, then until place() finds room
+    area_size = area[2] * area[3]
+    while scale > MIN_FIELD_SCALE and sum(width * height for width, height in field_boxes(sizes, scale)) > area_size:
+        scale = max(MIN_FIELD_SCALE, scale * FIELD_SHRINK)
+    while True:
+        try:
+            return scale, place(field_boxes(sizes, scale), area, rng)
+        except ValueError:
+            if scale <= MIN_FIELD_SCALE:
+                raise ValueError(f"{len(sizes)} codes do not fit in {area[2]}x{area[3]}, even shrunk to "
+                                 f"{MIN_FIELD_SCALE:.0%} of their size") from None
+            scale = max(MIN_FIELD_SCALE, scale * FIELD_SHRINK)
+
+def check_field(screen_size, code_count):
+    # Raises ValueError up front if a field round of code_count codes cannot
+    # fit this screen, with every code as large as any symbology gets once rotated
+    canvases = [canvas_size(symbology.size, MAX_ANGLE if symbology.rotate else 0)
+                for symbology in symbologies.available_symbologies()]
+    largest = (max(width for width, _ in canvases), max(height for _, height in canvases))
+    place_field([largest] * code_count, field_area(screen_size), np.random.default_rng(0), ui_scale(screen_size))
+
+def build_round(screen_size, code_count=CODE_COUNT, damaged_codes=False, seed=None, budget_ms=ROUND_BUDGET_MS,
+                difficulty=None, code_types=None, field=False):
+    # Everything reset_game needs for one round, as plain picklable data.
+    # Symbologies are picked from the registry within the encode budget, the
+    # clean bitmaps come from the cache and codes of the same size are damaged
+    # as one batch. With a difficulty, only calibrated symbologies are used,
+    # damaged with their calibrated parameters, and every code is read back.
+    #
+    # The seed drives everything. The budget depends on measured encode times,
+    # so to rebuild a recorded round pass its code_types as well; choice,
+    # codes, layout and damage use separate streams, so skipping the choice
+    # leaves the rest unchanged.
+    #
+    # Codes are built at their reference size and scaled up for the screen
+    # here in the worker, so the game only converts them.
+    #
+    # In a field round all codes are shown at once; they are placed after
+    # damage, so the boxes kept apart are the rotated images and their labels.
+    # Codes are shrunk, below their reference size if need be, until they fit.
+    screen_width, screen_height = screen_size
+    scale = ui_scale(screen_size)
+    code_width, code_height, margin = (round(value * scale) for value in (CODE_WIDTH, CODE_HEIGHT, MARGIN))
+    seed = new_seed() if seed is None else seed
+    choice_rng, code_rng, layout_rng, rng = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(4)]
+    damage = {}
+    if difficulty is not None:
+        damage = calibrated_damage(difficulty)
+        damaged_codes = bool(damage)
+        if not damage:
+            print(f"No calibration for difficulty {difficulty}, run calibrate.py. Using clean codes.")
+    if code_types is not None:
+        chosen = [symbologies.get(name) for name in code_types]
+    else:
+        chosen = symbologies.choose(code_count, choice_rng, budget_ms, names=list(damage) or None)
+    codes = [symbology.payload(generate_code(code_rng)) for symbology in chosen]
+    positions = [(int(layout_rng.integers(margin, screen_width - code_width - margin + 1)),
+                  int(layout_rng.integers(margin, screen_height - code_height - margin + 1))) for _ in range(code_count)]
+
+    groups = {}
+    for index, symbology in enumerate(chosen):
+        params = damage.get(symbology.name, {})
+        groups.setdefault((symbology.size, symbology.rotate, tuple(sorted(params.items()))), []).append(index)
+    images = [None] * code_count
+    for (size, rotate, params), indices in groups.items():
+        clean_images = [render_clean(chosen[i].name, codes[i], store=False) for i in indices]
+        group_images = damage_group(clean_images, [chosen[i] for i in indices], [codes[i] for i in indices], rng,
+                                    damaged_codes, rotate, dict(params), verify_codes=difficulty is not None)
+        for index, image in zip(indices, group_images):
+            images[index] = image
+    if field:
+        # Trimmed to what the rotation actually covered, the canvas allows for the largest angle
+        images = [trim(image) for image in images]
+        scale, positions = place_field([image.size for image in images], field_area(screen_size), layout_rng, scale)
+    images = [scale_image(image, scale) for image in images]
+
+    return {"seed": seed, "codes": codes, "positions": positions, "images": images,
+            "code_types": [symbology.name for symbology in chosen], "costs": symbologies.cost_report()}
@@ -0,0 +1,196 @@
+import math
+
+import numpy as np
+from PIL import Image
+
+# Batched damage engine. Takes a stack of equal-sized RGBA code bitmaps as one
+# (N, H, W, 4) uint8 array and applies blur, noise, flip, rotation and
+# perspective to the whole stack at once: the blur is two batched matrix
+# products and flip, rotation and perspective are folded into one homography
+# per code that is sampled in a single gather of packed RGBA pixels. All randomness comes from one
+# np.random.Generator, so a round is reproducible from its seed.
+
+BLUR_SIGMA = 2.0  # Matches the old GaussianBlur(radius=2)
+NOISE_LEVEL = 0.2  # Blend factor of the noise layer
+NOISE_MAX = 100  # Noise values are drawn from [0, NOISE_MAX)
+MAX_ANGLE = 30  # Rotation is drawn from [-MAX_ANGLE, MAX_ANGLE] degrees
+PERSPECTIVE = 0.0  # Maximum perspective tilt, as a fraction of the code size
+
+FLIP_NONE = 0
+FLIP_LEFT_RIGHT = 1
+FLIP_TOP_BOTTOM = 2
+
+# Packed RGBA pixels: the fill of the old rotate(), and the pieces of an
+# opaque grey pixel (grey * GREY_PIXEL + OPAQUE_PIXEL)
+FILL_PIXEL = np.array([255, 255, 255, 0], dtype=np.uint8).view(np.uint32)[0]
+GREY_PIXEL = np.array([1, 1, 1, 0], dtype=np.uint8).view(np.uint32)[0]
+OPAQUE_PIXEL = np.array([0, 0, 0, 255], dtype=np.uint8).view(np.uint32)[0]
+
+
+_blur_matrices = {}
+
+def blur_matrix(length, sigma):
+    # Dense (length x length) Gaussian operator with clamped edges, so the blur
+    # of a whole stack is two batched matrix products
+    key = (length, sigma)
+    if key not in _blur_matrices:
+        radius = max(1, int(math.ceil(3 * sigma)))
+        offsets = np.arange(-radius, radius + 1)
+        kernel = np.exp(-(offsets * offsets) / (2 * sigma * sigma))
+        kernel /= kernel.sum()
+        matrix = np.zeros((length, length), dtype=np.float32)
+        rows = np.arange(length)
+        for offset, weight in zip(offsets, kernel):
+            np.add.at(matrix, (rows, np.clip(rows + offset, 0, length - 1)), weight)
+        _blur_matrices[key] = matrix
+    return _blur_matrices[key]
+
+def blur(planes, sigma=BLUR_SIGMA):
+    # Separable Gaussian blur of a float (N, C, H, W) stack
+    height, width = planes.shape[-2:]
+    return blur_matrix(height, sigma) @ planes @ blur_matrix(width, sigma).T
+
+def add_noise(planes, rng, level=NOISE_LEVEL):
+    # Blend the colour planes with uniform noise (one value per pixel, like the
+    # old greyscale noise layer), an alpha plane is left alone
+    count, _, height, width = planes.shape
+    # Random bytes are several times cheaper to draw than floats; 256 steps
+    # are plenty for noise that is blended in at level
+    noise = np.frombuffer(rng.bytes(count * height * width), dtype=np.uint8).reshape(count, 1, height, width)
+    noise = noise * np.float32(NOISE_MAX * level / 256)
+    planes[:, :3] *= np.float32(1 - level)
+    planes[:, :3] += noise
+    return planes
+
+def canvas_size(size, max_angle=MAX_ANGLE, perspective=PERSPECTIVE):
+    # Smallest canvas that fits the code at any angle up to max_angle (like expand=True)
+    width, height = size
+    angle = math.radians(min(abs(max_angle), 90))
+    if angle > math.pi / 4:
+        angle = math.pi / 4  # Bounding box is largest at 45 degrees
+    grow = 1 + 2 * perspective
+    out_width = int(math.ceil((width * math.cos(angle) + height * math.sin(angle)) * grow))
+    out_height = int(math.ceil((width * math.sin(angle) + height * math.cos(angle)) * grow))
+    return out_width, out_height
+
+def transforms(count, size, rng, flips, max_angle=MAX_ANGLE, perspective=PERSPECTIVE):
+    # One forward homography per code, in coordinates centred on the code:
+    # flip, then rotate, then tilt
+    width, height = size
+    flips = np.broadcast_to(np.asarray(flips), (count,))
+    matrices = np.tile(np.eye(3), (count, 1, 1))
+    matrices[flips == FLIP_LEFT_RIGHT, 0, 0] = -1
+    matrices[flips == FLIP_TOP_BOTTOM, 1, 1] = -1
+
+    angles = np.radians(rng.uniform(-max_angle, max_angle, size=count))
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotation = np.tile(np.eye(3), (count, 1, 1))
+    # Counter-clockwise on screen, like PIL's rotate()
+    rotation[:, 0, 0], rotation[:, 0, 1] = cos, sin
+    rotation[:, 1, 0], rotation[:, 1, 1] = -sin, cos
+    matrices = rotation @ matrices
+
+    if perspective:
+        tilt = np.tile(np.eye(3), (count, 1, 1))
+        tilt[:, 2, 0] = rng.uniform(-perspective, perspective, size=count) / width
+        tilt[:, 2, 1] = rng.uniform(-perspective, perspective, size=count) / height
+        matrices = tilt @ matrices
+    return matrices
+
+_grids = {}
+
+def output_grid(out_size):
+    # Homogeneous pixel-centre coordinates of the output canvas, centred on 0,
+    # for the perspective case
+    if out_size not in _grids:
+        out_width, out_height = out_size
+        xs = np.arange(out_width, dtype=np.float32) + 0.5 - out_width / 2
+        ys = np.arange(out_height, dtype=np.float32) + 0.5 - out_height / 2
+        xs, ys = np.meshgrid(xs, ys)
+        _grids[out_size] = np.stack([xs.ravel(), ys.ravel(), np.ones(xs.size, dtype=np.float32)])
+    return _grids[out_size]
+
+def warp(pixels, size, matrices, out_size):
+    # Nearest-neighbour inverse mapping of every code through its homography
+    # (PIL's rotate() also samples nearest). pixels is the (N, H, W) stack of
+    # packed RGBA uint32 pixels, so each pixel is moved by a single gather.
+    count = len(pixels)
+    width, height = size
+    out_width, out_height = out_size
+    row = width + 2
+
+    # The codes get a one pixel border of transparent fill, and source
+    # coordinates are clamped onto it, so no separate inside test is needed.
+    # The shift makes the inverse map straight into padded pixel coordinates.
+    shift = np.array([[1, 0, width / 2 + 1], [0, 1, height / 2 + 1], [0, 0, 1]])
+    inverse = (shift @ np.linalg.inv(matrices)).astype(np.float32)
+    if perspective_used(matrices):
+        source = inverse @ output_grid(out_size)  # (N, 3, P)
+        source[:, :2] /= source[:, 2:3]
+        src_x = source[:, 0].astype(np.int32)
+        src_y = source[:, 1].astype(np.int32)
+    else:
+        # Affine maps are separable in x and y, one broadcast add per axis
+        xs = np.arange(out_width, dtype=np.float32) + np.float32(0.5 - out_width / 2)
+        ys = np.arange(out_height, dtype=np.float32) + np.float32(0.5 - out_height / 2)
+        src_x = (inverse[:, 0, None, :1] * xs + (inverse[:, 0, 1:2] * ys + inverse[:, 0, 2:])[:, :, None]).astype(np.int32)
+        src_y = (inverse[:, 1, None, :1] * xs + (inverse[:, 1, 1:2] * ys + inverse[:, 1, 2:])[:, :, None]).astype(np.int32)
+    np.clip(src_x, 0, width + 1, out=src_x)
+    np.clip(src_y, 0, height + 1, out=src_y)
+    index = src_y
+    index *= row
+    index += src_x
+    index = index.reshape(count, -1)
+    index += (np.arange(count, dtype=np.int32) * (row * (height + 2)))[:, None]
+
+    padded = np.empty((count, height + 2, row), dtype=np.uint32)
+    padded[:] = FILL_PIXEL
+    padded[:, 1:-1, 1:-1] = pixels
+    return padded.ravel().take(index).view(np.uint8).reshape(count, out_height, out_width, 4)
+
+def perspective_used(matrices):
+    return bool(matrices[:, 2, :2].any())
+
+def damage_batch(batch, rng=None, damaged=True, flips=FLIP_NONE, blur_sigma=BLUR_SIGMA,
+                 noise_level=NOISE_LEVEL, max_angle=MAX_ANGLE, perspective=PERSPECTIVE):
+    # batch: (N, H, W, 4) uint8. With damaged=False only the random rotation is
+    # applied, like the clean path of the generate_* functions.
+    # Returns an (N, H', W', 4) uint8 stack, H' x W' sized to fit any rotation.
+    if rng is None or isinstance(rng, (int, np.integer)):
+        rng = np.random.default_rng(rng)
+    count, height, width = batch.shape[:3]
+    packed = np.ascontiguousarray(batch).view(np.uint32)[..., 0]
+
+    if damaged:
+        # Encoded codes are opaque grey, so blur and noise only need one plane.
+        # Anything else is processed channel by channel.
+        grey_plane = batch[..., 0]
+        grey = (packed == grey_plane * GREY_PIXEL + OPAQUE_PIXEL).all()
+        if grey:
+            planes = grey_plane[:, None].astype(np.float32)
+        else:
+            planes = batch.transpose(0, 3, 1, 2).astype(np.float32)
+        if blur_sigma:
+            planes = blur(planes, blur_sigma)
+        if noise_level:
+            planes = add_noise(planes, rng, noise_level)
+        planes += 0.5
+        np.clip(planes, 0, 255, out=planes)
+        if grey:
+            packed = planes[:, 0].astype(np.uint32)
+            packed *= GREY_PIXEL
+            packed += OPAQUE_PIXEL
+        else:
+            packed = np.ascontiguousarray(planes.astype(np.uint8).transpose(0, 2, 3, 1)).view(np.uint32)[..., 0]
+    else:
+        flips = FLIP_NONE
+        perspective = 0.0
+
+    matrices = transforms(count, (width, height), rng, flips, max_angle, perspective)
+    return warp(packed, (width, height), matrices, canvas_size((width, height), max_angle, perspective))
+
+def stack_images(images):
+    return np.stack([np.asarray(image.convert('RGBA')) for image in images])
+
+def unstack_images(batch):
+    return [Image.fromarray(code, mode='RGBA') for code in batch]
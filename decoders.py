@@ -0,0 +1,58 @@
+from functools import lru_cache
+
+from PIL import Image
+
+# Barcode readers, used offline to check generated and photographed codes.
+# Both libraries are optional: pylibdmtx needs the libdmtx DLL, pyzbar the
+# zbar one. A decoder whose library is missing raises ImportError.
+
+DECODE_TIMEOUT_MS = 2000
+VERIFY_SCALE = 3  # Codes are drawn at 100 px; readers do better with more pixels per module
+
+
+def decode_datamatrix(image, shrink=1):
+    from pylibdmtx.pylibdmtx import decode
+    return [(result.data.decode('utf-8', 'replace'), 'datamatrix')
+            for result in decode(image, timeout=DECODE_TIMEOUT_MS, shrink=shrink, max_count=1)]
+
+def decode_zbar(image, shrink=1):
+    # QR, EAN/UPC, Code 128 and friends
+    from pyzbar.pyzbar import decode
+    if shrink > 1:
+        image = image.reduce(shrink)
+    return [(result.data.decode('utf-8', 'replace'), result.type.lower()) for result in decode(image)]
+
+DECODERS = [decode_datamatrix, decode_zbar]
+
+# Which reader checks which registered symbology ('aztec' is drawn as a QR code)
+SYMBOLOGY_DECODERS = {
+    'datamatrix': decode_datamatrix,
+    'aztec': decode_zbar,
+    'code128': decode_zbar,
+    'upcean': decode_zbar,
+}
+
+
+def prepare(image):
+    # Flatten onto white and enlarge, as a scanner would see the screen
+    image = image.convert('RGBA')
+    flat = Image.new('RGBA', image.size, (255, 255, 255, 255))
+    flat.alpha_composite(image)
+    flat = flat.convert('L')
+    return flat.resize((flat.width * VERIFY_SCALE, flat.height * VERIFY_SCALE), Image.NEAREST)
+
+@lru_cache(maxsize=None)
+def can_verify(name):
+    decoder = SYMBOLOGY_DECODERS.get(name)
+    if decoder is None:
+        return False
+    try:
+        decoder(Image.new('L', (8, 8), 255))
+    except ImportError:
+        return False
+    return True
+
+def verify(name, image, payload):
+    # True if the reader for this symbology gets payload back out of image
+    results = SYMBOLOGY_DECODERS[name](prepare(image))
+    return any(data == payload for data, _ in results)
@@ -0,0 +1,130 @@
+import math
+import time
+
+import pygame
+
+# Feedback effects, composited by the Renderer like any other item. Every
+# animation is an entry on one Timeline that runs on a monotonic clock:
+#
+#   flash       full-screen tint under the code after an answer, held, then faded
+#   transition  veil over everything when the game changes state, fading out
+#   pop         the current code growing in when it is shown
+#
+# Tints are solid display-format surfaces built once per colour, and a fade
+# only changes their surface alpha, the cheapest blend SDL has. Progress is
+# quantised to FADE_STEPS / POP_STEPS frames, so the dirty-rect renderer
+# repaints at most that many times per effect. A frame costs at most one
+# flash, one veil and one code blit more than it would without effects, at
+# any resolution.
+
+FADE_STEPS = 8
+POP_STEPS = 6
+POP_DURATION = 0.15
+POP_START_SCALE = 0.6
+FLASH_HOLD = 0.6  # Share of a flash shown at full strength before it fades
+TRANSITION_DURATION = 0.25
+
+
+class Timeline:
+    # One entry per channel; scheduling on a busy channel replaces its entry
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.entries = {}  # channel -> (start, duration, data)
+        self.now = clock()
+
+    def schedule(self, channel, duration, data=None, delay=0.0):
+        self.entries[channel] = (self.clock() + delay, duration, data)
+
+    def cancel(self, channel):
+        self.entries.pop(channel, None)
+
+    def advance(self):
+        # Called once per frame, so every effect in it sees the same time
+        self.now = self.clock()
+
+    def active(self, channel):
+        # (progress from 0 to 1, data) for the entry on channel, or None
+        entry = self.entries.get(channel)
+        if entry is None:
+            return None
+        start, duration, data = entry
+        elapsed = self.now - start
+        if elapsed < 0:
+            return None
+        if elapsed >= duration:
+            del self.entries[channel]
+            return None
+        return elapsed / duration, data
+
+
+class Effects:
+    def __init__(self, screen_size, clock=time.monotonic):
+        self.screen_size = screen_size
+        self.timeline = Timeline(clock)
+        self.tints = {}  # (channel, colour) -> full-screen surface
+        self.pop_source = None
+        self.pop_frames = []
+
+    def flash(self, color, duration):
+        self.timeline.schedule("flash", duration, color)
+
+    def transition(self, color):
+        self.timeline.schedule("transition", TRANSITION_DURATION, color)
+
+    def pop(self):
+        self.timeline.schedule("pop", POP_DURATION)
+
+    def begin_frame(self):
+        self.timeline.advance()
+
+    def _tint(self, channel, color):
+        # Each channel has its own surface, their alphas change independently
+        surface = self.tints.get((channel, color))
+        if surface is None:
+            surface = pygame.Surface(self.screen_size)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            surface.fill(color)
+            self.tints[(channel, color)] = surface
+        return surface
+
+    def _draw_tint(self, renderer, channel, hold):
+        active = self.timeline.active(channel)
+        if active is None:
+            return
+        progress, color = active
+        strength = 1.0 if progress < hold else (1.0 - progress) / (1.0 - hold)
+        level = math.ceil(strength * FADE_STEPS)
+        surface = self._tint(channel, color)
+        surface.set_alpha(255 * level // FADE_STEPS)
+        renderer.blit(surface, (0, 0), key=(channel, color, level))
+
+    def draw_under(self, renderer):
+        # Between the background and the game's own items
+        self._draw_tint(renderer, "flash", FLASH_HOLD)
+
+    def draw_over(self, renderer):
+        # On top of everything the game drew
+        self._draw_tint(renderer, "transition", 0.0)
+
+    def _pop_frames(self, surface):
+        # Scaled copies of the code being shown, built once per code
+        if surface is not self.pop_source:
+            self.pop_source = surface
+            width, height = surface.get_size()
+            self.pop_frames = []
+            for step in range(POP_STEPS):
+                scale = POP_START_SCALE + (1.0 - POP_START_SCALE) * step / POP_STEPS
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                self.pop_frames.append(pygame.transform.smoothscale(surface, size))
+        return self.pop_frames
+
+    def draw_code(self, renderer, surface, pos):
+        active = self.timeline.active("pop")
+        if active is None:
+            renderer.blit(surface, pos)
+            return
+        step = min(int(active[0] * POP_STEPS), POP_STEPS - 1)
+        frame = self._pop_frames(surface)[step]
+        rect = frame.get_rect(center=surface.get_rect(topleft=pos).center)
+        renderer.blit(frame, rect.topleft, key=("pop", id(surface), step))
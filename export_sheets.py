@@ -0,0 +1,250 @@
+import argparse
+import csv
+import json
+import os
+import time
+import zlib
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from PIL import Image, ImageDraw, ImageFont
+
+import codegen
+import symbologies
+
+# Printable code cards for the booth, from the same encoders the games use:
+#
+#   python export_sheets.py payloads.csv --output cards.pdf
+#   python export_sheets.py payloads.jsonl --format png --output sheets --symbology aztec
+#
+# Input rows have a payload and optionally a symbology and a label (the text
+# printed under the code, the payload by default): CSV with a header row, or
+# one JSON object per line. Every code is encoded at the encoder's own
+# resolution and enlarged by a whole number of pixels per module, so it
+# prints sharp. Worker processes render whole 1-bit pages, only a few are in
+# flight at a time, and the PDF is written page by page, so memory stays flat
+# whatever the number of codes.
+
+DPI = 300
+PAGE_SIZES_MM = {"a4": (210, 297), "letter": (215.9, 279.4)}
+CARD_SIZE_MM = (85, 55)  # Badge / business card
+PAGE_MARGIN_MM = 10
+CARD_PADDING_MM = 4
+LABEL_SIZE_MM = 4  # Height of the label text
+PAGES_IN_FLIGHT = 2  # Per worker
+
+Layout = namedtuple('Layout', 'page_size card_size columns rows padding label_size borders')
+Card = namedtuple('Card', 'symbology payload label')
+
+
+def mm_to_px(mm, dpi=DPI):
+    return round(mm / 25.4 * dpi)
+
+def make_layout(page='a4', card_mm=CARD_SIZE_MM, dpi=DPI, borders=False):
+    page_width, page_height = (mm_to_px(mm, dpi) for mm in PAGE_SIZES_MM[page])
+    card_width, card_height = (mm_to_px(mm, dpi) for mm in card_mm)
+    margin = mm_to_px(PAGE_MARGIN_MM, dpi)
+    columns = (page_width - 2 * margin) // card_width
+    rows = (page_height - 2 * margin) // card_height
+    if not columns or not rows:
+        raise ValueError(f"a {card_mm[0]}x{card_mm[1]} mm card does not fit on {page}")
+    return Layout((page_width, page_height), (card_width, card_height), columns, rows,
+                  mm_to_px(CARD_PADDING_MM, dpi), mm_to_px(LABEL_SIZE_MM, dpi), borders)
+
+def normalize_payload(symbology, raw):
+    # The payload as the games would encode it, e.g. with the EAN-13 check
+    # digit added, or None if it is not valid. The symbology may only complete
+    # what was given, so a wrong check digit is rejected rather than replaced.
+    if symbology.validate(raw):
+        return raw
+    try:
+        payload = symbology.payload(raw)
+    except ValueError:
+        return None
+    return payload if payload.startswith(raw) and symbology.validate(payload) else None
+
+def read_cards(path, default_symbology):
+    # Cards from a CSV or JSONL file, one at a time; invalid payloads are reported and skipped
+    usable = {symbology.name for symbology in symbologies.available_symbologies()}
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+        for line, row in enumerate(rows, start=1):
+            raw = str(row.get("payload") or "").strip()
+            name = row.get("symbology") or default_symbology
+            payload = normalize_payload(symbologies.get(name), raw) if name in usable else None
+            if payload is None:
+                print(f"Row {line}: cannot encode {raw!r} as {name}. Skipping.")
+                continue
+            yield Card(name, payload, row.get("label") or payload)
+
+
+def fit_code(image, box_size):
+    # Whole-number enlargement, so every module covers the same pixels
+    width, height = image.size
+    factor = min(box_size[0] // width, box_size[1] // height)
+    if factor >= 1:
+        return image.resize((width * factor, height * factor), Image.NEAREST)
+    scale = min(box_size[0] / width, box_size[1] / height)
+    return image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+
+def load_font(size):
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()  # Pillow < 10.1 only has the small bitmap font
+
+def render_page(cards, layout):
+    # Worker side: one page as a 1-bit image, and the cards that could not be
+    # encoded as (card, error) pairs; the rest close up so the page has no gaps
+    failed = []
+    codes = []
+    for card in cards:
+        try:
+            codes.append((card, symbologies.get(card.symbology).encode(card.payload)))
+        except Exception as e:
+            failed.append((card, f"{type(e).__name__}: {e}"))
+    page = Image.new('1', layout.page_size, 1)
+    draw = ImageDraw.Draw(page)
+    font = load_font(layout.label_size)
+    card_width, card_height = layout.card_size
+    left = (layout.page_size[0] - layout.columns * card_width) // 2
+    top = (layout.page_size[1] - layout.rows * card_height) // 2
+    code_box = (card_width - 2 * layout.padding, card_height - 3 * layout.padding - layout.label_size)
+    for index, (card, image) in enumerate(codes):
+        row, column = divmod(index, layout.columns)
+        x, y = left + column * card_width, top + row * card_height
+        if layout.borders:
+            draw.rectangle((x, y, x + card_width - 1, y + card_height - 1), outline=0)
+        # Flattened onto white first, transparent pixels would turn black
+        flat = Image.new('L', image.size, 255)
+        flat.paste(image.convert('L'), mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        code = fit_code(flat, code_box).point(lambda value: 255 if value >= 128 else 0).convert('1')
+        page.paste(code, (x + (card_width - code.width) // 2, y + layout.padding + (code_box[1] - code.height) // 2))
+        draw.text((x + card_width // 2, y + card_height - layout.padding), card.label, fill=0, font=font,
+                  anchor='md')
+    return page, failed
+
+
+class PdfWriter:
+    # Minimal PDF, written as pages arrive: every page is one 1-bit image.
+    # Object 1 is the catalog and 2 the page tree; both are written last,
+    # once all pages are known.
+    def __init__(self, path, dpi=DPI):
+        self.file = open(path, 'wb')
+        self.dpi = dpi
+        self.offsets = {}
+        self.pages = []
+        self.next_id = 3
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self.file.tell()
+        self.file.write(f'{object_id} 0 obj\n'.encode('ascii') + body)
+        if stream is not None:
+            self.file.write(b'\nstream\n' + stream + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def add_page(self, image):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        width, height = image.size
+        # Mode '1' rows are packed to whole bytes with 1 = white, as DeviceGray expects
+        data = zlib.compress(image.tobytes(), 6)
+        self._object(image_id, f'<< /Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                               f'/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode '
+                               f'/Length {len(data)} >>'.encode('ascii'), data)
+        points = (width * 72 / self.dpi, height * 72 / self.dpi)
+        content = f'q {points[0]:.2f} 0 0 {points[1]:.2f} 0 0 cm /Im0 Do Q'.encode('ascii')
+        self._object(content_id, f'<< /Length {len(content)} >>'.encode('ascii'), content)
+        self._object(page_id, f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {points[0]:.2f} {points[1]:.2f}] '
+                              f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> '
+                              f'/Contents {content_id} 0 R >>'.encode('ascii'))
+        self.pages.append(page_id)
+
+    def close(self):
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.pages)
+        self._object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>'.encode('ascii'))
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = self.file.tell()
+        count = self.next_id
+        self.file.write(f'xref\n0 {count}\n0000000000 65535 f \n'.encode('ascii'))
+        for object_id in range(1, count):
+            self.file.write(f'{self.offsets[object_id]:010d} 00000 n \n'.encode('ascii'))
+        self.file.write(f'trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('ascii'))
+        self.file.close()
+
+
+class PngSheets:
+    def __init__(self, directory, dpi=DPI):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dpi = dpi
+        self.count = 0
+
+    def add_page(self, image):
+        self.count += 1
+        image.save(os.path.join(self.directory, f'sheet-{self.count:04d}.png'), dpi=(self.dpi, self.dpi))
+
+    def close(self):
+        pass
+
+
+def export(cards, writer, layout, workers=None):
+    # Pages are rendered in order by the pool with a bounded number in
+    # flight and handed to writer as they finish. Cards that fail to encode
+    # are reported and left out. The writer is closed even if the export
+    # stops half way, so the pages written so far stay readable.
+    # Returns (pages, cards).
+    per_page = layout.columns * layout.rows
+    cards = iter(cards)
+    pages = cards_done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=codegen.seed_worker) as executor:
+            limit = PAGES_IN_FLIGHT * (workers or os.cpu_count() or 1)
+            in_flight = deque()
+            while True:
+                while len(in_flight) < limit:
+                    chunk = list(islice(cards, per_page))
+                    if not chunk:
+                        break
+                    in_flight.append((len(chunk), executor.submit(render_page, chunk, layout)))
+                if not in_flight:
+                    break
+                count, future = in_flight.popleft()
+                page, failed = future.result()
+                for card, error in failed:
+                    print(f"Cannot encode {card.payload!r} as {card.symbology} ({error}). Skipping.")
+                if count > len(failed):
+                    writer.add_page(page)
+                    pages += 1
+                    cards_done += count - len(failed)
+    finally:
+        writer.close()
+    return pages, cards_done
+
+def main():
+    parser = argparse.ArgumentParser(description="Render payloads as printable code sheets")
+    parser.add_argument("input", help="CSV with a header row, or JSONL; fields payload, symbology, label")
+    parser.add_argument("--output", default="cards.pdf", help="PDF file, or directory for --format png")
+    parser.add_argument("--format", choices=("pdf", "png"), default="pdf")
+    parser.add_argument("--symbology", default="datamatrix", help="for rows that do not name one")
+    parser.add_argument("--page", choices=sorted(PAGE_SIZES_MM), default="a4")
+    parser.add_argument("--card", type=float, nargs=2, default=CARD_SIZE_MM, metavar=("WIDTH_MM", "HEIGHT_MM"))
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("--borders", action="store_true", help="draw cut lines around the cards")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    layout = make_layout(args.page, args.card, args.dpi, args.borders)
+    writer = PdfWriter(args.output, args.dpi) if args.format == "pdf" else PngSheets(args.output, args.dpi)
+    start = time.perf_counter()
+    pages, count = export(read_cards(args.input, args.symbology), writer, layout, args.workers)
+    print(f"{count} codes on {pages} pages ({layout.columns}x{layout.rows} per page) written to {args.output} "
+          f"in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
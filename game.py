@@ -0,0 +1,251 @@
+import time
+
+import pygame
+
+from assets import asset_path
+from audio import AudioEngine
+from effects import Effects
+from textcache import TextCache
+
+# The typing game's state machine and drawing, shared by tradeshow.py and
+# tradeShowPictures.py. Nothing happens at import time; the scripts build a
+# Game in main() and feed it events. Sounds are optional and the clock can be
+# replaced, so the game can also run headless (benchmarks, replays).
+
+# Game states
+START_SCREEN = 0
+GAME_RUNNING = 1
+GAME_OVER = 2
+SHOW_LEADERBOARD = 3
+STATE_NAMES = {START_SCREEN: "START_SCREEN", GAME_RUNNING: "GAME_RUNNING", GAME_OVER: "GAME_OVER",
+               SHOW_LEADERBOARD: "SHOW_LEADERBOARD"}
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+
+START_CODE_TEXT = "START"
+GREEN_SCREEN_DURATION = 0.5
+RED_SCREEN_DURATION = 0.5
+
+NAME_PROMPT = "Enter your name:"
+CONTINUE_HINT = "Press Enter to return to the start screen"
+
+
+def load_sounds(instruments=None):
+    # Cues are decoded once and cached, the music streams; see audio.py
+    audio = AudioEngine(instruments)
+    success_sound = audio.load("success", asset_path('success.mp3'), "feedback", volume=1.0)
+    error_sound = audio.load("error", asset_path('error.mp3'), "feedback", volume=1.0)
+    audio.play_music(asset_path('background.mp3'), volume=0.3)  # Lower volume for background music
+    return success_sound, error_sound
+
+
+class Game:
+    def __init__(self, screen_size, font, large_font, start_button_image, next_round, leaderboard,
+                 background=WHITE, success_sound=None, error_sound=None, code_size=(100, 100), clock=time.time,
+                 field=False):
+        self.screen_width, self.screen_height = screen_size
+        self.font = font
+        self.large_font = large_font
+        self.start_button_image = start_button_image
+        self.next_round = next_round  # () -> (codes, positions, code surfaces)
+        self.leaderboard = leaderboard
+        self.background = background
+        self.success_sound = success_sound
+        self.error_sound = error_sound
+        self.code_width, self.code_height = code_size
+        self.clock = clock  # Replays pass the recorded event times
+        self.field = field  # All codes at once, answered in any order
+
+        self.running = True
+        self.game_state = START_SCREEN
+        self.codes = []
+        self.positions = []
+        self.code_images = []
+        self.code_index = 0  # Codes answered so far
+        self.remaining = {}  # Field rounds: code -> indices of it still on screen
+        self.input_text = ""
+        self.name_input = ""
+        self.start_time = 0
+        self.end_time = 0
+        # Flashes, transitions and pop-ins run on a monotonic timeline of their own
+        self.effects = Effects(screen_size)
+
+        # Rendered text is reused between frames, the static strings are ready up front
+        self.text_cache = TextCache()
+        self.text_cache.prerender(font, [NAME_PROMPT, CONTINUE_HINT], BLACK)
+        self.text_cache.prerender(large_font, ["Leaderboard"], BLACK)
+
+    def start_round(self):
+        # The round is usually ready by now, this only swaps it in
+        self.codes, self.positions, self.code_images = self.next_round()
+        self.code_index = 0
+        self.input_text = ""
+        self.remaining = {}
+        if self.field:
+            for index, code in enumerate(self.codes):
+                self.remaining.setdefault(code, []).append(index)
+        self.start_time = self.clock()
+        self.effects.pop()
+
+    def answer(self, typed):
+        # True if typed is the code asked for; in a field round any code still shown
+        if not self.field:
+            print(f"Expected: {self.codes[self.code_index]}")
+            print(f"Entered: {typed}")
+            return typed == self.codes[self.code_index]
+        print(f"Entered: {typed}")
+        indices = self.remaining.get(typed)
+        if not indices:
+            return False
+        indices.pop()
+        if not indices:
+            del self.remaining[typed]
+        return True
+
+    def set_state(self, state):
+        self.game_state = state
+        self.effects.transition(WHITE)
+
+    def play(self, sound):
+        if sound is not None:
+            sound.play()
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.running = False
+
+        if self.game_state == START_SCREEN:
+            if event.type == pygame.KEYDOWN:
+                # Handle keyboard input
+                if event.key == pygame.K_BACKSPACE:
+                    self.input_text = self.input_text[:-1]
+                elif event.key == pygame.K_RETURN:
+                    # Check if input text matches start code
+                    if self.input_text.strip().upper() == START_CODE_TEXT:
+                        self.start_round()
+                        self.set_state(GAME_RUNNING)
+                else:
+                    self.input_text += event.unicode
+
+        elif self.game_state == GAME_RUNNING:
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_BACKSPACE:
+                    self.input_text = self.input_text[:-1]
+                elif event.key == pygame.K_RETURN:
+                    if self.answer(self.input_text.strip()):
+                        self.code_index += 1
+                        self.input_text = ""
+                        self.play(self.success_sound)
+                        self.effects.flash(GREEN, GREEN_SCREEN_DURATION)
+                        if self.code_index == len(self.codes):
+                            self.set_state(GAME_OVER)
+                            self.end_time = self.clock()
+                        elif not self.field:
+                            self.effects.pop()
+                    else:
+                        self.input_text = ""
+                        self.play(self.error_sound)
+                        self.effects.flash(RED, RED_SCREEN_DURATION)
+                else:
+                    self.input_text += event.unicode
+
+        elif self.game_state == GAME_OVER:
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_BACKSPACE:
+                    self.name_input = self.name_input[:-1]
+                elif event.key == pygame.K_RETURN:
+                    if self.name_input:
+                        self.leaderboard.add(self.name_input, self.end_time - self.start_time)
+                        self.set_state(SHOW_LEADERBOARD)
+                else:
+                    self.name_input += event.unicode
+
+        elif self.game_state == SHOW_LEADERBOARD:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+                self.name_input = ""
+                self.set_state(START_SCREEN)
+
+    def draw_code(self, renderer, index):
+        x, y = self.positions[index]
+        image = self.code_images[index]
+        if self.field:
+            # Images differ in size once rotated, the label goes under each one
+            renderer.blit(image, (x, y))
+            label_y = y + image.get_height() + 10
+        else:
+            self.effects.draw_code(renderer, image, (x, y))
+            label_y = y + self.code_height + 10
+        code = self.codes[index]
+        renderer.blit(self.text_cache.render(self.font, code, BLACK), (x, label_y), key=("code", index, code))
+
+    def draw(self, renderer):
+        font = self.font
+        text_cache = self.text_cache
+        center_x = self.screen_width // 2
+        center_y = self.screen_height // 2
+        effects = self.effects
+        effects.begin_frame()
+
+        if self.game_state == START_SCREEN:
+            renderer.set_background(self.background)
+            renderer.blit(self.start_button_image, (center_x - self.code_width // 2, center_y - self.code_height // 2))
+            input_text_surface = text_cache.render_input(font, self.input_text, BLACK)
+            renderer.blit(input_text_surface, (10, 10), key=("input", self.input_text))
+
+        elif self.game_state == GAME_RUNNING:
+            renderer.set_background(self.background)
+            effects.draw_under(renderer)
+            if self.field:
+                for indices in self.remaining.values():
+                    for index in indices:
+                        self.draw_code(renderer, index)
+            else:
+                self.draw_code(renderer, self.code_index)
+            input_text_surface = text_cache.render_input(font, self.input_text, BLACK)
+            renderer.blit(input_text_surface, (10, 10), key=("input", self.input_text))
+
+        elif self.game_state == GAME_OVER:
+            renderer.set_background(self.background)
+            time_taken = self.end_time - self.start_time
+            result_text = text_cache.render(font, f"Time: {time_taken:.2f} seconds", BLACK)
+            renderer.blit(result_text, (center_x - 100, center_y - 75), key=("result", time_taken))
+            renderer.blit(text_cache.render(font, NAME_PROMPT, BLACK), (center_x - 100, center_y), key="name prompt")
+            name_input_surface = text_cache.render_input(font, self.name_input, BLACK)
+            renderer.blit(name_input_surface, (center_x - 100, center_y + 30), key=("name", self.name_input))
+
+        elif self.game_state == SHOW_LEADERBOARD:
+            renderer.set_background(WHITE)
+            leaderboard_title = text_cache.render(self.large_font, "Leaderboard", BLACK)
+            renderer.blit(leaderboard_title, (center_x - 100, center_y - 150), key="leaderboard title")
+            for idx, entry in enumerate(self.leaderboard.top()):
+                line = f"{idx + 1}. {entry['name']} - {entry['time']:.2f} seconds"
+                leaderboard_text = text_cache.render(font, line, BLACK)
+                renderer.blit(leaderboard_text, (center_x - 200, center_y - 100 + idx * 30), key=("leaderboard", line))
+            continue_text = text_cache.render(font, CONTINUE_HINT, BLACK)
+            renderer.blit(continue_text, (center_x - 200, self.screen_height - 50), key="continue")
+
+        effects.draw_over(renderer)
+
+
+def run(game, renderer, trace, instruments):
+    # The main loop both scripts share
+    draw_phases = {state: f"draw {name}" for state, name in STATE_NAMES.items()}
+    while game.running:
+        events = renderer.events()
+        with instruments.phase("events"):
+            for event in events:
+                if instruments.handle_event(event):
+                    continue  # Overlay toggle
+                trace.event(event)
+                game.handle_event(event)
+        with instruments.phase(draw_phases[game.game_state]):
+            game.draw(renderer)
+            instruments.draw(renderer, game.text_cache)
+        with instruments.phase("present"):
+            renderer.present(tick=False)
+        instruments.frame_presented()
+        renderer.tick()
@@ -0,0 +1,212 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pygame
+
+# Hot-path timers for the game loop. Each phase (event handling, drawing per
+# game state, pushing pixels to the display, building a round) is timed into
+# a histogram, and key presses are timed until the frame that shows them has
+# been presented. F3 shows an overlay with recent percentiles.
+#
+# Disabled, phase() hands out one shared no-op context manager, so the loop
+# pays a method call per phase and nothing else. Enable it with
+#
+#   TRADESHOW_METRICS=1              time everything, overlay starts hidden
+#   TRADESHOW_METRICS_FILE=path      also write Prometheus text every EXPORT_INTERVAL s
+#   TRADESHOW_METRICS_PORT=9464      also serve it on http://localhost:9464/metrics
+#
+# or by pressing F3, which turns timing on together with the overlay.
+
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 16.7, 25, 50, 100, 250, 500, 1000)
+WINDOW = 600  # Recent samples per phase the overlay percentiles are taken from
+EXPORT_INTERVAL = 10.0
+OVERLAY_REFRESH = 0.5  # Seconds between overlay text updates
+OVERLAY_KEY = pygame.K_F3
+OVERLAY_COLOR = (255, 255, 0)
+OVERLAY_FONT = "consolas,dejavusansmono,couriernew,monospace"
+OVERLAY_FONT_SIZE = 18
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # Last one is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.count += 1
+        self.recent.append(ms)
+
+    def percentile(self, fraction):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Phase:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter() - self.start) * 1000)
+
+
+class NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+NULL_PHASE = NullPhase()
+
+
+class Instruments:
+    def __init__(self, enabled=False, export_path=None, port=None):
+        self.enabled = enabled or bool(export_path or port)
+        self.overlay = False
+        self.histograms = {}
+        self.phases = {}
+        self.lock = threading.Lock()  # The exporter reads from another thread
+        self.pending_keys = []
+        self.export_path = export_path
+        self.last_export = time.monotonic()
+        self.overlay_lines = []
+        self.overlay_updated = 0.0
+        self.font = None
+        self.server = serve_metrics(self, port) if port else None
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self.histogram(name))
+        return phase
+
+    def timed(self, name, function):
+        # function wrapped in a phase, e.g. the round provider
+        def wrapper(*args, **kwargs):
+            with self.phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def handle_event(self, event):
+        # True if the event was the overlay toggle and should not reach the game
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == OVERLAY_KEY:
+            self.overlay = not self.overlay
+            self.enabled = self.enabled or self.overlay
+            return True
+        if self.enabled:
+            self.pending_keys.append(time.perf_counter())
+        return False
+
+    def frame_presented(self):
+        # Key-to-pixel latency: from the loop receiving a key to the frame
+        # showing its effect having been handed to the display
+        if self.pending_keys:
+            now = time.perf_counter()
+            histogram = self.histogram("key to pixel")
+            for pressed in self.pending_keys:
+                histogram.observe((now - pressed) * 1000)
+            self.pending_keys = []
+        if self.export_path and time.monotonic() - self.last_export >= EXPORT_INTERVAL:
+            self.last_export = time.monotonic()
+            write_metrics(self, self.export_path)
+
+    def draw(self, renderer, text_cache):
+        if not self.overlay:
+            return
+        if self.font is None:
+            self.font = pygame.font.SysFont(OVERLAY_FONT, OVERLAY_FONT_SIZE)
+        font = self.font
+        now = time.monotonic()
+        if now - self.overlay_updated >= OVERLAY_REFRESH:
+            self.overlay_updated = now
+            self.overlay_lines = [f"{'phase':<22}{'p50':>8}{'p95':>8}{'p99':>8}"] + [
+                f"{name:<22}{h.percentile(0.5):>8.2f}{h.percentile(0.95):>8.2f}{h.percentile(0.99):>8.2f}"
+                for name, h in sorted(self.histograms.items())]
+        x = renderer.screen_rect.right - font.size(self.overlay_lines[0])[0] - 10
+        for index, line in enumerate(self.overlay_lines):
+            surface = text_cache.render(font, line, OVERLAY_COLOR)
+            renderer.blit(surface, (x, 10 + index * font.get_linesize()), key=("overlay", index, line))
+
+    def prometheus_text(self):
+        lines = ["# TYPE tradeshow_phase_ms histogram"]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for name, histogram in histograms:
+            label = name.replace('"', "'")
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f'tradeshow_phase_ms_bucket{{phase="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'tradeshow_phase_ms_sum{{phase="{label}"}} {histogram.total:.3f}')
+            lines.append(f'tradeshow_phase_ms_count{{phase="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self.export_path and self.enabled:
+            write_metrics(self, self.export_path)
+        if self.server is not None:
+            self.server.shutdown()
+
+
+def write_metrics(instruments, path):
+    # Written to a temp file and renamed, the way textfile collectors expect
+    try:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(instruments.prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write metrics to {path}: {e}")
+
+def serve_metrics(instruments, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = instruments.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would flood the console
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+def from_environment():
+    port = os.environ.get("TRADESHOW_METRICS_PORT")
+    return Instruments(enabled=os.environ.get("TRADESHOW_METRICS") == "1",
+                       export_path=os.environ.get("TRADESHOW_METRICS_FILE"), port=int(port) if port else None)
@@ -0,0 +1,174 @@
+import bisect
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Leaderboard storage. Every finished run is kept in a SQLite database (one
+# row per run, appended in its own transaction), so a crash or power loss can
+# lose at most the run being written, never the file. An in-memory index of
+# all times, kept sorted, answers top-N and rank queries without touching the
+# disk, and per-player bests are kept in a dict.
+#
+# add() is called from the game loop, so it only updates the index and queues
+# the row; a writer thread commits it. add_many() (the shared service) writes
+# before it returns.
+
+LEADERBOARD_FILE = 'leaderboard.db'
+LEGACY_FILE = 'leaderboard.json'  # Boards from before the database, imported once
+LEADERBOARD_SIZE = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    time REAL NOT NULL,
+    finished REAL NOT NULL,
+    uid TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (time);
+CREATE INDEX IF NOT EXISTS runs_by_name ON runs (name, time);
+"""
+# Runs submitted by kiosks carry an id, so a batch that is sent twice (the
+# reply got lost) is only stored once
+UID_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS runs_by_uid ON runs (uid)"
+
+
+def load_legacy_leaderboard(path=LEGACY_FILE):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return []
+
+
+class Leaderboard:
+    def __init__(self, path=LEADERBOARD_FILE, legacy_path=LEGACY_FILE):
+        self.path = path
+        # Used by the writer thread once the board is loaded, always under self.lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL appends instead of rewriting pages in place; FULL syncs every
+        # commit, so a finished run survives a power cut
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        if "uid" not in columns:  # Databases from before kiosks could submit
+            self.connection.execute("ALTER TABLE runs ADD COLUMN uid TEXT")
+        self.connection.execute(UID_INDEX)
+        self.times = []  # All times, sorted, for rank queries
+        self.runs = []  # (time, id, name, uid), sorted the same way, for top-N
+        self.bests = {}  # name -> best time
+        self.uids = set()
+        rows = self._all_runs()
+        if not rows and legacy_path and os.path.exists(legacy_path):
+            rows = self._import_legacy(legacy_path)
+        for run_id, name, time_taken, uid in rows:
+            self._index(run_id, name, time_taken, uid)
+        # Ids are handed out here, so a run is in the index before its row exists
+        self.next_id = max((row[0] for row in rows), default=0) + 1
+        self.lock = threading.Lock()
+        self.writes = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name="leaderboard-writer", daemon=True)
+        self.writer.start()
+
+    def _all_runs(self):
+        return self.connection.execute("SELECT id, name, time, uid FROM runs ORDER BY time, id").fetchall()
+
+    def _import_legacy(self, legacy_path):
+        entries = load_legacy_leaderboard(legacy_path)
+        with self.connection:
+            self.connection.executemany("INSERT INTO runs (name, time, finished) VALUES (?, ?, ?)",
+                                        [(entry["name"], entry["time"], 0.0) for entry in entries])
+        return self._all_runs()
+
+    def _index(self, run_id, name, time_taken, uid=None):
+        bisect.insort(self.times, time_taken)
+        bisect.insort(self.runs, (time_taken, run_id, name, uid))
+        if name not in self.bests or time_taken < self.bests[name]:
+            self.bests[name] = time_taken
+        if uid is not None:
+            self.uids.add(uid)
+
+    def _rows(self, runs):
+        # Rows for the runs whose uid is not stored yet. Every run is checked
+        # before any row is made, so a malformed one (KeyError, TypeError,
+        # ValueError) rejects the batch without changing anything.
+        rows = []
+        seen = set()
+        next_id = self.next_id
+        for run in runs:
+            name, time_taken, uid = str(run["name"]), float(run["time"]), run.get("uid")
+            finished = run.get("finished")
+            finished = time.time() if finished is None else float(finished)
+            if uid is not None and (uid in self.uids or uid in seen):
+                continue
+            seen.add(uid)
+            rows.append((next_id, name, time_taken, finished, uid))
+            next_id += 1
+        return rows
+
+    def _accept(self, rows):
+        for run_id, name, time_taken, _, uid in rows:
+            self._index(run_id, name, time_taken, uid)
+        if rows:
+            self.next_id = rows[-1][0] + 1
+
+    def _write(self, rows):
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO runs (id, name, time, finished, uid) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _write_loop(self):
+        while (rows := self.writes.get()) is not None:
+            # Everything queued meanwhile goes into the same transaction
+            while True:
+                try:
+                    more = self.writes.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self.writes.put(None)
+                    break
+                rows += more
+            try:
+                self._write(rows)
+            except sqlite3.Error as e:
+                print(f"Could not store {len(rows)} leaderboard runs: {e}")
+
+    def add(self, name, time_taken, finished=None, uid=None):
+        # Shown straight away, stored by the writer thread
+        rows = self._rows([{"name": name, "time": time_taken, "finished": finished, "uid": uid}])
+        self._accept(rows)
+        self.writes.put(rows)
+        return self.rank(time_taken)
+
+    def add_many(self, runs):
+        # One transaction for the whole batch, indexed only once it is
+        # committed; runs whose uid is already stored are skipped. Returns how
+        # many were new.
+        rows = self._rows(runs)
+        self._write(rows)
+        self._accept(rows)
+        return len(rows)
+
+    def top(self, count=LEADERBOARD_SIZE):
+        return [{"name": name, "time": time_taken, "uid": uid} for time_taken, _, name, uid in self.runs[:count]]
+
+    def best(self, name):
+        return self.bests.get(name)
+
+    def rank(self, time_taken):
+        # 1-based place a run with this time has; ties share the better place
+        return bisect.bisect_left(self.times, time_taken) + 1
+
+    def __len__(self):
+        return len(self.times)
+
+    def close(self):
+        # Waits for the queued runs to be written
+        self.writes.put(None)
+        self.writer.join()
+        self.connection.close()
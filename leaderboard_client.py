@@ -0,0 +1,150 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+from leaderboard import LEADERBOARD_SIZE, Leaderboard
+from leaderboard_service import HOST, PORT
+
+# Kiosk side of the shared leaderboard. It has the same add()/top() interface
+# as Leaderboard, and neither call does any I/O: add() only appends to the
+# pending list, and top() returns the board from the last sync merged with
+# runs that have not been confirmed yet. A background thread sends pending
+# runs in batches and fetches the board every SYNC_INTERVAL seconds. When the
+# service is down, pending runs stay in a local buffer file and are sent once
+# it is back.
+
+SERVICE_VARIABLE = "LEADERBOARD_SERVICE"  # host:port of the shared service
+BUFFER_FILE = 'leaderboard_buffer.json'
+SYNC_INTERVAL = 0.5  # Seconds between syncs, the shared board is at most this old
+TIMEOUT = 2.0  # Seconds before a silent service counts as down
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(":")
+    return (host or HOST, int(port or PORT))
+
+def load_buffer(path):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return []
+
+def save_buffer(runs, path):
+    # Write to a temporary file and rename, so a crash leaves the old buffer
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(handle, 'w') as file:
+        json.dump(runs, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class LeaderboardClient:
+    def __init__(self, address=(HOST, PORT), buffer_path=BUFFER_FILE, sync_interval=SYNC_INTERVAL):
+        self.address = address
+        self.buffer_path = buffer_path
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.pending = load_buffer(buffer_path)  # Runs the service has not confirmed
+        self.buffered = [run["uid"] for run in self.pending]  # What the buffer file holds
+        self.board = []  # Top of the shared board at the last sync
+        self.merged = None  # board and pending merged, rebuilt when either changes
+        self.connected = False
+        self.connection = None
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="leaderboard-sync", daemon=True)
+        self.thread.start()
+
+    def add(self, name, time_taken):
+        run = {"uid": uuid.uuid4().hex, "name": name, "time": time_taken, "finished": time.time()}
+        with self.lock:
+            self.pending.append(run)
+            self.merged = None
+        self.wake.set()
+
+    def top(self, count=LEADERBOARD_SIZE):
+        with self.lock:
+            if self.merged is None:
+                shown = {run["uid"] for run in self.board}
+                runs = self.board + [run for run in self.pending if run["uid"] not in shown]
+                self.merged = sorted(runs, key=lambda run: run["time"])[:LEADERBOARD_SIZE]
+            return self.merged[:count]
+
+    def _request(self, request):
+        if self.connection is None:
+            self.connection = socket.create_connection(self.address, timeout=TIMEOUT).makefile('rwb')
+        self.connection.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.connection.flush()
+        line = self.connection.readline()
+        if not line:
+            raise ConnectionError("leaderboard service closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise ValueError(response.get("error", "leaderboard service refused the request"))
+        return response
+
+    def _disconnect(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except OSError:
+                pass
+        self.connection = None
+        self.connected = False
+
+    def _save(self, runs):
+        uids = [run["uid"] for run in runs]
+        if uids != self.buffered:
+            save_buffer(runs, self.buffer_path)
+            self.buffered = uids
+
+    def sync(self):
+        with self.lock:
+            batch = list(self.pending)
+        self._save(batch)  # Survives a crash before the service has it
+        try:
+            if batch:
+                self._request({"op": "submit", "runs": batch})
+            board = self._request({"op": "top", "count": LEADERBOARD_SIZE})["top"]
+        except (OSError, ValueError, KeyError):
+            self._disconnect()
+            return False
+        self.connected = True
+        sent = {run["uid"] for run in batch}
+        with self.lock:
+            self.pending = [run for run in self.pending if run["uid"] not in sent]
+            self.board = board
+            self.merged = None
+            remaining = list(self.pending)
+        self._save(remaining)
+        return True
+
+    def _run(self):
+        while not self.stopping:
+            self.sync()
+            self.wake.wait(self.sync_interval)
+            self.wake.clear()
+
+    def close(self):
+        # One last attempt to hand over what is pending, then the buffer keeps it
+        self.stopping = True
+        self.wake.set()
+        self.thread.join(TIMEOUT * 2)
+        if not self.thread.is_alive():
+            self.sync()
+        self._disconnect()
+
+
+def open_leaderboard(service=None):
+    # The shared board if LEADERBOARD_SERVICE is set, this machine's otherwise
+    service = service or os.environ.get(SERVICE_VARIABLE)
+    if service:
+        return LeaderboardClient(parse_address(service))
+    return Leaderboard()
@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+
+from leaderboard import LEADERBOARD_FILE, LEADERBOARD_SIZE, Leaderboard
+
+# Shared leaderboard for several kiosks. One machine (or any spare laptop at
+# the booth) runs
+#
+#   python leaderboard_service.py --host 0.0.0.0
+#
+# and the games point LEADERBOARD_SERVICE=host:port at it. The protocol is one
+# JSON object per line over TCP:
+#
+#   {"op": "submit", "runs": [{"uid": ..., "name": ..., "time": ..., "finished": ...}]}
+#       -> {"ok": true, "added": 1}
+#   {"op": "top", "count": 10}
+#       -> {"ok": true, "top": [...], "runs": 1234}
+#
+# Submitting the same run twice is harmless, the uid makes it a no-op.
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+class LeaderboardService:
+    def __init__(self, leaderboard):
+        self.leaderboard = leaderboard
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "submit":
+            return {"ok": True, "added": self.leaderboard.add_many(request.get("runs", []))}
+        if op == "top":
+            return {"ok": True, "top": self.leaderboard.top(request.get("count", LEADERBOARD_SIZE)),
+                    "runs": len(self.leaderboard)}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    async def serve_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve(host=HOST, port=PORT, path=LEADERBOARD_FILE):
+    service = LeaderboardService(Leaderboard(path))
+    server = await asyncio.start_server(service.serve_client, host, port)
+    print(f"Leaderboard service on {host}:{port}, {len(service.leaderboard)} runs in {path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.leaderboard.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared leaderboard for several game kiosks")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--database", default=LEADERBOARD_FILE)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.database))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
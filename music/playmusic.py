@@ -1,38 +1,54 @@
 import pygame
 import random
 import os
+import sys
+import time
 from pylibdmtx.pylibdmtx import encode
 from io import BytesIO
 from PIL import Image
 
-# Initialize pygame
+# The audio engine lives with the tradeshow games one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio
+from scanner import ScanParser
+
+KEYS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keys')
+
+# Initialize pygame, with the mixer's small buffer set up first
+audio.pre_init()
 pygame.init()
 
 # Constants
 FONT_SIZE = 32
 COLUMNS = 6  # Number of columns to display DataMatrix codes
+KEY_COUNT = 24
+KEY_PATTERN = r"KEY\d\d|^\d\d?$"  # Scanned KEY17, or 17 typed by hand
+FPS = 30  # Cap for redraws; the loop sleeps in event.wait() between events
+ROWS = -(-KEY_COUNT // COLUMNS)
+CODE_FILL = 0.7  # Share of a cell's free height the code may take
+HIGHLIGHT_TIME = 0.3  # Seconds a played cell stays marked
+HIGHLIGHT_WIDTH = 8
+SHUFFLE_KEY = pygame.K_F5
 
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
+HIGHLIGHT = (255, 170, 0)
 
 # Initialize the screen in fullscreen mode
 screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
 pygame.display.set_caption("Music Code Game")
-WIDTH, HEIGHT = screen.get_size()
 
-# Configure mixer for better sound quality
-pygame.mixer.pre_init(44100, -16, 2, 512)
-pygame.mixer.init()
-
-# Load sounds
+# Load sounds, decoded once and cached as PCM. Every key has a mixer channel of
+# its own, so different keys ring on together and a repeated key restarts itself
+key_codes = [f"KEY{idx+1:02d}" for idx in range(KEY_COUNT)]
+engine = audio.AudioEngine(groups=dict.fromkeys(key_codes, 1))
 sounds = {}
-for idx in range(24):
-    key_code = f"KEY{idx+1:02d}"
-    file_path = f"keys/key{idx+1:02d}.mp3"
+for idx, key_code in enumerate(key_codes):
+    file_path = os.path.join(KEYS_DIR, f"key{idx+1:02d}.mp3")
     if not os.path.isfile(file_path):
-        raise FileNotFoundError(f"No file '{file_path}' found in working directory.")
-    sounds[key_code] = pygame.mixer.Sound(file_path)
+        raise FileNotFoundError(f"No file '{file_path}' found.")
+    sounds[key_code] = engine.load(key_code, file_path, key_code)
 
 # Generate DataMatrix codes
 codes = list(sounds.keys())
@@ -53,34 +69,82 @@ def create_datamatrix_image(data):
 # Create DataMatrix images for each code
 datamatrix_images = {code: create_datamatrix_image(code) for code in codes}
 
-# Game loop
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.unicode.isdigit():
-                key = f"KEY{int(event.unicode):02d}"
-                if key in codes:
-                    sounds[key].play()
-
-    # Draw everything
-
-    screen.fill(WHITE)
+def build_wall(size):
+    # The whole grid composited once: codes scaled up by a whole number (so
+    # modules stay sharp) to fill their cells, labels rendered once.
+    # Returns the surface and each code's cell.
+    width, height = size
+    cell_width, cell_height = width // COLUMNS, height // ROWS
+    label_height = font.get_linesize() + 5
+    wall = pygame.Surface(size).convert()
+    wall.fill(WHITE)
+    cells = {}
     for idx, code in enumerate(codes):
-        datamatrix_image = datamatrix_images[code]
-        x = (idx % COLUMNS) * (WIDTH // COLUMNS) + (WIDTH // COLUMNS - datamatrix_image.get_width()) // 2
-        y = (idx // COLUMNS) * (HEIGHT // 4) + (HEIGHT // 4 - datamatrix_image.get_height()) // 2
-        screen.blit(datamatrix_image, (x, y))
-        
+        cell = pygame.Rect((idx % COLUMNS) * cell_width, (idx // COLUMNS) * cell_height, cell_width, cell_height)
+        cells[code] = cell
+        image = datamatrix_images[code]
+        room = min(cell_width, cell_height - label_height) * CODE_FILL
+        factor = max(1, int(room // max(image.get_size())))
+        image = pygame.transform.scale(image, (image.get_width() * factor, image.get_height() * factor))
+        image_rect = image.get_rect(centerx=cell.centerx, centery=cell.centery - label_height // 2)
+        wall.blit(image, image_rect)
+
         # Draw the code value below the DataMatrix image
         text_surface = font.render(code, True, BLACK)
-        text_x = x + (datamatrix_image.get_width() - text_surface.get_width()) // 2
-        text_y = y + datamatrix_image.get_height() + 5  # Small margin below the image
-        screen.blit(text_surface, (text_x, text_y))
+        wall.blit(text_surface, text_surface.get_rect(centerx=cell.centerx, top=image_rect.bottom + 5))
+    return wall, cells
+
+def key_for(payload):
+    return payload if payload.startswith("KEY") else f"KEY{int(payload):02d}"
+
+# Game loop. The wall is one blit; a played cell is marked and later restored
+# from the wall, and only those cells are pushed to the display. Between
+# events the loop sleeps in event.wait(), waking for the next mark to clear.
+parser = ScanParser(KEY_PATTERN)
+clock = pygame.time.Clock()
+wall, cells = build_wall(screen.get_size())
+marked = {}  # code -> time its mark is cleared
+redraw = True
+running = True
+while running:
+    dirty = []
+    if redraw:
+        screen.blit(wall, (0, 0))
+        for code in marked:
+            pygame.draw.rect(screen, HIGHLIGHT, cells[code], HIGHLIGHT_WIDTH)
+        redraw = False
+        dirty.append(screen.get_rect())
+    now = time.monotonic()
+    for code in [code for code, clear_at in marked.items() if clear_at <= now]:
+        del marked[code]
+        screen.blit(wall, cells[code], cells[code])
+        dirty.append(cells[code])
+    if dirty:
+        pygame.display.update(dirty)
+        clock.tick(FPS)
 
-    pygame.display.flip()
-    pygame.time.Clock().tick(30)
+    timeout = max(1, int((min(marked.values()) - time.monotonic()) * 1000) + 1) if marked else 0
+    for event in [pygame.event.wait(timeout)] + pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+        elif event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.VIDEOEXPOSE):
+            redraw = True
+        elif event.type in (pygame.WINDOWSIZECHANGED, pygame.VIDEORESIZE):
+            wall, cells = build_wall(screen.get_size())
+            redraw = True
+        elif event.type == pygame.KEYDOWN and event.key == SHUFFLE_KEY:
+            random.shuffle(codes)
+            wall, cells = build_wall(screen.get_size())
+            redraw = True
+        for payload in parser.feed(event):
+            code = key_for(payload)
+            cue = sounds.get(code)
+            if cue is None:
+                continue
+            cue.play()
+            marked[code] = time.monotonic() + HIGHLIGHT_TIME
+            screen.blit(wall, cells[code], cells[code])
+            pygame.draw.rect(screen, HIGHLIGHT, cells[code], HIGHLIGHT_WIDTH)
+            pygame.display.update(cells[code])
 
 pygame.quit()
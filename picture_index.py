@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from decoders import DECODERS
+from picture_ingest import SKIPPED_EXTENSIONS, THUMBNAIL_DIR, file_digest, ingest_file, register_heif
+
+# Expected answers for the photographed codes. An offline batch job decodes
+# every picture and writes a sidecar next to them:
+#
+#   python picture_index.py codepictures
+#
+# codes.json maps each file name to its decoded payload, symbology, a
+# difficulty (1 = decodes from a quarter-size image, 3 = needs full size) and
+# the content digest its thumbnail is cached under. Entries can be corrected
+# by hand; they are marked "source": "manual" and a rebuild leaves them alone.
+# The game only looks answers up, it never decodes.
+
+INDEX_FILE = 'codes.json'
+THUMBNAIL_SIZE = (100, 100)
+DECODE_SCALES = (4, 2, 1)  # Shrink factors tried in order; the pass that works is the difficulty
+
+
+def decode_picture(path):
+    # (payload, symbology, difficulty), or (None, None, None) if nothing decodes
+    with Image.open(path) as img:
+        image = img.convert('L')
+    for difficulty, shrink in enumerate(DECODE_SCALES, start=1):
+        for decoder in DECODERS:
+            try:
+                results = decoder(image, shrink)
+            except ImportError:
+                continue  # Decoder library not installed on this machine
+            if results:
+                payload, symbology = results[0]
+                return payload, symbology, difficulty
+    return None, None, None
+
+def index_picture(path, size=THUMBNAIL_SIZE, cache_dir=THUMBNAIL_DIR):
+    # Worker side: thumbnail (through the ingest cache) and decode in one pass
+    digest, thumbnail = ingest_file(path, size, cache_dir)
+    if thumbnail is None:
+        return digest, None
+    payload, symbology, difficulty = decode_picture(path)
+    return digest, {"digest": digest, "payload": payload, "symbology": symbology,
+                    "difficulty": difficulty, "source": "decoded"}
+
+def load_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_FILE), 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_index(index, directory):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(index, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(directory, INDEX_FILE))
+
+def build_index(directory, workers=None, force=False, size=THUMBNAIL_SIZE):
+    index = load_index(directory)
+    names = [name for name in sorted(os.listdir(directory))
+             if os.path.isfile(os.path.join(directory, name)) and not name.lower().endswith(SKIPPED_EXTENSIONS)]
+    todo = []
+    for name in names:
+        entry = index.get(name)
+        if entry and entry.get("source") == "manual":
+            continue
+        if force or not entry or entry.get("digest") != file_digest(os.path.join(directory, name)):
+            todo.append(name)
+    for name in [name for name in index if name not in names]:
+        del index[name]  # Deleted pictures
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=register_heif) as executor:
+        paths = [os.path.join(directory, name) for name in todo]
+        for name, (_, entry) in zip(todo, executor.map(index_picture, paths, [size] * len(paths))):
+            if entry is None:
+                print(f"Cannot identify image file {name}. Skipping.")
+                index.pop(name, None)
+                continue
+            if entry["payload"] is None:
+                print(f"No code found in {name}, add its payload by hand")
+            index[name] = entry
+    save_index(index, directory)
+    return index
+
+
+class PictureIndex:
+    # Answer lookups for the game. The sidecar is re-read when its mtime
+    # changes, which costs one stat per round.
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILE)
+        self.mtime = None
+        self.entries = {}
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.mtime:
+            self.mtime = mtime
+            self.entries = load_index(self.directory)
+
+    def answer(self, path):
+        # The payload for a picture, or None if it has no known answer
+        entry = self.entries.get(os.path.basename(path))
+        return entry.get("payload") if entry else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode the code pictures and write their answer index")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--force", action="store_true", help="decode every picture again")
+    args = parser.parse_args()
+    index = build_index(args.directory, args.workers, args.force)
+    decoded = sum(1 for entry in index.values() if entry.get("payload") is not None)
+    print(f"{decoded} of {len(index)} pictures have an answer, written to {os.path.join(args.directory, INDEX_FILE)}")
+
+if __name__ == "__main__":
+    main()
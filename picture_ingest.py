@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, UnidentifiedImageError
+
+from codecache import CACHE_DIR, ImageCache
+
+# Ingest stage for the codepictures directory. Photos are multi-megapixel
+# JPEG/HEIC shots that end up as 100x100 thumbnails, so:
+#
+# - JPEGs are decoded at reduced size (Image.draft lets libjpeg scale by 1/2,
+#   1/4 or 1/8 while decoding) before the final LANCZOS resize.
+# - Thumbnails are cached by content hash. A manifest remembers each file's
+#   mtime, size and hash, so unchanged files are not even read again.
+# - Files that do need decoding are spread over a process pool.
+#
+# HEIC needs the optional pillow-heif package; without it those files are
+# skipped like any other unreadable file. The manifest notes whether it was
+# installed when a file failed, so installing it later retries those files.
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, 'thumbnails')
+MANIFEST_FILE = 'manifest.json'
+DRAFT_FACTOR = 2  # Decode at least this many times the thumbnail size, for LANCZOS to work with
+HASH_CHUNK = 1 << 20
+SKIPPED_EXTENSIONS = ('.json',)  # Sidecar files that live next to the pictures
+
+
+def register_heif():
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        return False
+    register_heif_opener()
+    return True
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        while chunk := file.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def decode_thumbnail(path, size):
+    with Image.open(path) as img:
+        # Only JPEG supports draft; elsewhere it does nothing
+        img.draft('RGB', (size[0] * DRAFT_FACTOR, size[1] * DRAFT_FACTOR))
+        img = img.convert('RGBA')
+    return img.resize(size, Image.LANCZOS)
+
+def thumbnail_key(digest, size):
+    return ("thumbnail", digest, tuple(size))
+
+def ingest_file(path, size, cache_dir=THUMBNAIL_DIR):
+    # Worker side: hash, then reuse a thumbnail another run already stored
+    # (e.g. a renamed file) or decode a new one. Returns (digest, thumbnail),
+    # with thumbnail None for files that are not images.
+    digest = file_digest(path)
+    cache = ImageCache(cache_dir, max_entries=0)
+    key = thumbnail_key(digest, size)
+    thumbnail = cache.lookup(key)
+    if thumbnail is None:
+        try:
+            thumbnail = decode_thumbnail(path, size)
+        except (UnidentifiedImageError, OSError):
+            return digest, None
+        cache.put(key, thumbnail)
+    return digest, thumbnail
+
+def load_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE), 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest, cache_dir):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, os.path.join(cache_dir, MANIFEST_FILE))
+    except OSError as e:
+        print(f"Could not write thumbnail manifest: {e}")
+
+
+class PictureIngest:
+    def __init__(self, size, cache_dir=THUMBNAIL_DIR, workers=None):
+        self.size = tuple(size)
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.cache = ImageCache(cache_dir)
+        # path -> [mtime_ns, size, digest, readable, heif], heif being whether
+        # HEIF support was installed at the time
+        self.manifest = load_manifest(cache_dir)
+        self.decoded = 0  # Files that had to be read in the last ingest
+        self.heif = register_heif()
+
+    def _unchanged(self, path, stat):
+        entry = self.manifest.get(path)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry
+        return None
+
+    def ingest(self, directory):
+        # Thumbnails of every image in directory, sorted by file name
+        return [thumbnail for _, thumbnail in self.scan(directory).values()]
+
+    def scan(self, directory):
+        # path -> (digest, thumbnail) for every image in directory, in file name order
+        if not os.path.exists(directory):
+            raise FileNotFoundError(f"The directory {directory} does not exist.")
+        paths = [os.path.abspath(os.path.join(directory, f)) for f in sorted(os.listdir(directory))]
+        paths = [path for path in paths if os.path.isfile(path) and not path.lower().endswith(SKIPPED_EXTENSIONS)]
+        thumbnails = {}
+        stats = {}
+        todo = []
+        for path in paths:
+            stats[path] = stat = os.stat(path)
+            entry = self._unchanged(path, stat)
+            if entry and not entry[3] and entry[4:] == [self.heif]:
+                continue  # Known not to be an image, reported when it was first seen
+            thumbnail = self.cache.lookup(thumbnail_key(entry[2], self.size)) if entry else None
+            if thumbnail is not None:
+                thumbnails[path] = (entry[2], thumbnail)
+            else:
+                todo.append(path)
+
+        self.decoded = len(todo)
+        if len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=register_heif) as executor:
+                results = list(executor.map(ingest_file, todo, [self.size] * len(todo),
+                                            [self.cache_dir] * len(todo)))
+        else:
+            results = [ingest_file(path, self.size, self.cache_dir) for path in todo]
+
+        for path, (digest, thumbnail) in zip(todo, results):
+            stat = stats[path]
+            self.manifest[path] = [stat.st_mtime_ns, stat.st_size, digest, thumbnail is not None, self.heif]
+            if thumbnail is None:
+                hint = "" if self.heif else " HEIC pictures need pillow-heif."
+                print(f"Cannot identify image file {path}. Skipping.{hint}")
+                continue
+            self.cache.put(thumbnail_key(digest, self.size), thumbnail, store=False)
+            thumbnails[path] = (digest, thumbnail)
+
+        directory = os.path.abspath(directory)
+        deleted = [path for path in self.manifest if path not in stats and os.path.dirname(path) == directory]
+        for path in deleted:
+            del self.manifest[path]
+        if todo or deleted:
+            save_manifest(self.manifest, self.cache_dir)
+        return {path: thumbnails[path] for path in paths if path in thumbnails}
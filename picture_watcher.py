@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+from picture_ingest import PictureIngest
+from surfaces import pil_to_surface
+
+# Keeps the code pictures up to date while the game runs. A background thread
+# re-ingests the directory whenever something in it changes, which only
+# decodes added or changed files, and publishes the result. The game loop
+# picks it up with surfaces(), which converts just the new thumbnails.
+#
+# Changes are noticed through the optional watchdog package (inotify on
+# Linux, ReadDirectoryChangesW on Windows). Without it the directory listing
+# is polled every POLL_INTERVAL seconds, which only stats the files.
+
+POLL_INTERVAL = 1.0
+SETTLE_TIME = 0.25  # Copies show up as several events, wait for them to finish
+
+
+def directory_signature(directory):
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                             for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return frozenset()
+
+def start_observer(directory, callback):
+    # A watchdog observer calling callback on every change, or None without watchdog
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            callback()
+
+    observer = Observer()
+    observer.schedule(Handler(), directory, recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+
+class PictureWatcher:
+    def __init__(self, directory, size, poll_interval=POLL_INTERVAL):
+        self.directory = directory
+        self.ingest = PictureIngest(size)
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stopping = False
+        self.signature = frozenset()
+        self.published = {}  # path -> (digest, thumbnail), replaced as a whole on every scan
+        self.version = 0
+        self.converted = {}  # digest -> surface, main thread only
+        self.shown_version = -1
+        self.shown = []  # (path, surface) in file name order
+        self.observer = None
+        self.thread = None
+
+    def start(self):
+        # The first scan runs right here, so a missing directory fails at start-up
+        self.signature = directory_signature(self.directory)
+        self._publish(self.ingest.scan(self.directory))
+        self.observer = start_observer(self.directory, self.changed.set)
+        self.thread = threading.Thread(target=self._run, name="picture-watcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def _publish(self, scanned):
+        with self.lock:
+            self.published = scanned
+            self.version += 1
+
+    def _run(self):
+        while not self.stopping:
+            if self.observer is not None:
+                self.changed.wait()
+            else:
+                self.changed.wait(self.poll_interval)
+            if self.stopping:
+                break
+            if self.changed.is_set():
+                time.sleep(SETTLE_TIME)
+            self.changed.clear()
+            signature = directory_signature(self.directory)
+            if signature == self.signature:
+                continue
+            self.signature = signature
+            try:
+                self._publish(self.ingest.scan(self.directory))
+            except OSError as e:
+                print(f"Could not rescan {self.directory}: {e}")
+
+    def surfaces(self):
+        return [surface for _, surface in self.pictures()]
+
+    def pictures(self):
+        # (path, surface) for the current pictures; cheap unless the directory changed
+        with self.lock:
+            version, published = self.version, self.published
+        if version != self.shown_version:
+            converted = {}
+            for digest, thumbnail in published.values():
+                if digest not in converted:  # Identical files share a surface
+                    converted[digest] = self.converted.get(digest) or pil_to_surface(thumbnail)
+            self.converted = converted
+            self.shown = [(path, converted[digest]) for path, (digest, _) in published.items()]
+            self.shown_version = version
+        return self.shown
+
+    def stop(self):
+        self.stopping = True
+        self.changed.set()
+        if self.observer is not None:
+            self.observer.stop()
+        if self.thread is not None:
+            self.thread.join()
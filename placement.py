@@ -0,0 +1,128 @@
+# Non-overlapping placement for field rounds, where every code of a round is
+# on screen at once. Boxes are dropped at random spots and checked only
+# against the boxes already in the grid cells they touch, so a few hundred
+# codes place in milliseconds instead of testing every pair.
+#
+# Random drops stop finding room at a bit over half the screen covered, so a
+# crowded round is packed into rows instead, with the room left over shared
+# out at random so the layout still looks scattered.
+
+ATTEMPTS = 32  # Random spots tried per box before scanning for a free one
+GAP = 10  # Minimum space between boxes
+RANDOM_COVERAGE = 0.35  # Above this share of the area covered, go straight to rows
+
+
+class SpatialGrid:
+    # Uniform grid of buckets; a rect is listed in every cell it touches
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> [(x, y, width, height)]
+
+    def _cells(self, rect):
+        x, y, width, height = rect
+        size = self.cell_size
+        for column in range(x // size, (x + width - 1) // size + 1):
+            for row in range(y // size, (y + height - 1) // size + 1):
+                yield column, row
+
+    def hit(self, rect):
+        # A placed rect overlapping rect, or None
+        x, y, width, height = rect
+        for cell in self._cells(rect):
+            for other in self.cells.get(cell, ()):
+                other_x, other_y, other_width, other_height = other
+                if x < other_x + other_width and other_x < x + width and \
+                        y < other_y + other_height and other_y < y + height:
+                    return other
+        return None
+
+    def insert(self, rect):
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, []).append(rect)
+
+
+def _scan(grid, area, width, height, gap):
+    # First free spot row by row, for when random tries keep hitting
+    # neighbours. A row skips past whatever it runs into, so a crowded screen
+    # costs a few checks per placed box rather than one per pixel.
+    left, top, area_width, area_height = area
+    for y in range(top, top + area_height - height + 1, gap):
+        x = left
+        while x <= left + area_width - width:
+            other = grid.hit((x, y, width + gap, height + gap))
+            if other is None:
+                return x, y
+            x = other[0] + other[2]
+    return None
+
+def _spread(spare, count, rng):
+    # spare pixels cut at random into count + 1 pieces
+    cuts = sorted(rng.integers(0, spare + 1, count).tolist())
+    return [b - a for a, b in zip([0] + cuts, cuts + [spare])]
+
+def place_on_shelves(sizes, area, rng, gap=GAP):
+    # Dense layout: boxes in rows (tallest first, so rows waste little height),
+    # then the spare room is shared out at random between rows and between the
+    # boxes of a row, and each row is shuffled so sizes mix on screen
+    left, top, area_width, area_height = area
+    shelves = [[]]
+    shelf_width = 0
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        width = sizes[index][0] + gap
+        if shelves[-1] and shelf_width + width > area_width + gap:
+            shelves.append([])
+            shelf_width = 0
+        shelves[-1].append(index)
+        shelf_width += width
+    heights = [sizes[shelf[0]][1] + gap for shelf in shelves]
+    if sum(heights) > area_height + gap or any(sizes[i][0] > area_width for i in range(len(sizes))):
+        raise ValueError(f"{len(sizes)} codes do not fit in {area_width}x{area_height}")
+    order = rng.permutation(len(shelves)).tolist()
+    positions = [None] * len(sizes)
+    y = top
+    for extra_y, shelf_number in zip(_spread(area_height + gap - sum(heights), len(shelves), rng), order):
+        y += extra_y
+        shelf = [shelves[shelf_number][i] for i in rng.permutation(len(shelves[shelf_number])).tolist()]
+        spare = area_width + gap - sum(sizes[index][0] + gap for index in shelf)
+        x = left
+        for extra_x, index in zip(_spread(spare, len(shelf), rng), shelf):
+            x += extra_x
+            width, height = sizes[index]
+            positions[index] = (x, y + int(rng.integers(0, heights[shelf_number] - gap - height + 1)))
+            x += width + gap
+        y += heights[shelf_number]
+    return positions
+
+def place(sizes, area, rng, gap=GAP, attempts=ATTEMPTS):
+    # Top-left corners for boxes of the given (width, height) inside area
+    # (x, y, width, height), at least gap apart. rng is a NumPy Generator.
+    # Raises ValueError if the boxes do not fit.
+    if not sizes:
+        return []
+    left, top, area_width, area_height = area
+    covered = sum((width + gap) * (height + gap) for width, height in sizes)
+    if covered > RANDOM_COVERAGE * area_width * area_height:
+        return place_on_shelves(sizes, area, rng, gap)
+    grid = SpatialGrid(max(max(size) for size in sizes) + gap)
+    positions = [None] * len(sizes)
+    # Largest boxes first, while there is room; the small ones fill the gaps
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i][0] * sizes[i][1]):
+        width, height = sizes[index]
+        if width > area_width or height > area_height:
+            raise ValueError(f"a {width}x{height} code does not fit in {area_width}x{area_height}")
+        # The gap is added on the right and bottom of every box, which keeps
+        # any two boxes gap apart
+        xs = rng.integers(left, left + area_width - width + 1, attempts)
+        ys = rng.integers(top, top + area_height - height + 1, attempts)
+        spot = None
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            if grid.hit((x, y, width + gap, height + gap)) is None:
+                spot = x, y
+                break
+        if spot is None:
+            spot = _scan(grid, area, width, height, gap)
+        if spot is None:
+            return place_on_shelves(sizes, area, rng, gap)
+        grid.insert((spot[0], spot[1], width + gap, height + gap))
+        positions[index] = spot
+    return positions
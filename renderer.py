@@ -0,0 +1,98 @@
+import time
+
+import pygame
+
+# Dirty-rectangle renderer for the game loops.
+#
+# Each frame the game lists what it wants on screen with blit(); present()
+# compares that with the previous frame and repaints only the rectangles where
+# something appeared, disappeared or changed, then pushes just those through
+# pygame.display.update(rects). Frames are capped at fps, and after idle_after
+# seconds without input the loop sleeps in pygame.event.wait() instead of
+# spinning, waking up idle_fps times a second for timed effects.
+
+FPS = 60
+IDLE_FPS = 4
+IDLE_AFTER = 2.0  # Seconds without events before the loop throttles down
+
+
+class Renderer:
+    def __init__(self, screen, background, fps=FPS, idle_fps=IDLE_FPS, idle_after=IDLE_AFTER):
+        self.screen = screen
+        self.screen_rect = screen.get_rect()
+        self.background = background  # Surface or colour tuple
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.clock = pygame.time.Clock()
+        self.last_event_time = time.monotonic()
+        self.items = []  # (key, surface, rect) of the frame being built
+        self.shown = []  # The same for the frame on screen
+        self.full_redraw = True
+
+    def set_background(self, background):
+        if background != self.background:
+            self.background = background
+            self.full_redraw = True
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def events(self):
+        now = time.monotonic()
+        idle = now - self.last_event_time > self.idle_after
+        if idle:
+            first = pygame.event.wait(1000 // self.idle_fps)
+            events = [] if first.type == pygame.NOEVENT else [first]
+            events.extend(pygame.event.get())
+        else:
+            events = pygame.event.get()
+        if events:
+            self.last_event_time = time.monotonic()
+        return events
+
+    def blit(self, surface, pos, key=None):
+        # key identifies the content (e.g. the rendered text), so a re-rendered
+        # but identical surface does not count as a change
+        rect = surface.get_rect(topleft=pos)
+        self.items.append((key if key is not None else id(surface), surface, rect))
+
+    def _paint_background(self, area):
+        if isinstance(self.background, pygame.Surface):
+            self.screen.blit(self.background, area, area)
+        else:
+            self.screen.fill(self.background, area)
+
+    def present(self, tick=True):
+        # tick=False leaves the frame cap to a separate tick() call, so the
+        # display update can be timed on its own
+        if self.full_redraw:
+            self._paint_background(self.screen_rect)
+            for _, surface, rect in self.items:
+                self.screen.blit(surface, rect)
+            pygame.display.update(self.screen_rect)
+            self.full_redraw = False
+        else:
+            previous = {(key, tuple(rect)) for key, _, rect in self.shown}
+            current = {(key, tuple(rect)) for key, _, rect in self.items}
+            dirty = [pygame.Rect(rect) for _, rect in previous ^ current]
+            dirty = [rect.clip(self.screen_rect) for rect in dirty]
+            dirty = [rect for rect in dirty if rect.width and rect.height]
+            for area in dirty:
+                # Repaint everything that overlaps the area, clipped to it, so
+                # unchanged neighbours are restored rather than drawn twice
+                self.screen.set_clip(area)
+                self._paint_background(area)
+                for _, surface, rect in self.items:
+                    if rect.colliderect(area):
+                        self.screen.blit(surface, rect)
+            self.screen.set_clip(None)
+            if dirty:
+                pygame.display.update(dirty)
+        self.shown = self.items
+        self.items = []
+        if tick:
+            self.tick()
+
+    def tick(self):
+        self.clock.tick(self.fps)
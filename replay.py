@@ -0,0 +1,218 @@
+import argparse
+import contextlib
+import io
+import os
+import struct
+import time
+from collections import deque, namedtuple
+
+import pygame
+
+# Recorded sessions. While a game runs, every round (its seed and codes) and
+# every key press with its time goes into a small binary trace under traces/.
+# A trace can be re-run headless through the real Game state machine as fast
+# as the CPU allows:
+#
+#   python replay.py traces/20240612-101500.trace            # what happened
+#   python replay.py traces/20240612-101500.trace --rebuild  # also time rebuilding every round
+#
+# Format: a header (magic, version, start time), then records that all start
+# with a type byte and the event time as a double (seconds, time.time()).
+# Strings are a length byte and UTF-8.
+#
+#   ROUND  seed u64, screen w/h u16, flags u8 (1 = damaged, 2 = field round), difficulty u8 (0 = none),
+#          count u8, then count x (symbology, code)
+#   KEY    key u32, mod u16, unicode
+#   QUIT   -
+
+TRACE_DIR = 'traces'
+MAGIC = b'TSTR'
+VERSION = 1
+HEADER = struct.Struct('<4sHd')
+RECORD = struct.Struct('<Bd')
+ROUND_FIELDS = struct.Struct('<QHHBBB')
+KEY_FIELDS = struct.Struct('<IH')
+
+ROUND = 1
+KEY = 2
+QUIT = 3
+
+ROUND_DAMAGED = 1
+ROUND_FIELD = 2
+
+RoundRecord = namedtuple('RoundRecord', 'time seed screen_size damaged difficulty code_types codes field')
+KeyRecord = namedtuple('KeyRecord', 'time key mod unicode')
+QuitRecord = namedtuple('QuitRecord', 'time')
+
+
+def pack_string(text):
+    data = text.encode('utf-8')[:255]
+    return bytes((len(data),)) + data
+
+def trace_path(directory=TRACE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, time.strftime('%Y%m%d-%H%M%S') + '.trace')
+
+
+class TraceWriter:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+
+    def round(self, seed, screen_size, code_types, codes, damaged=False, difficulty=None, field=False, now=None):
+        flags = (ROUND_DAMAGED if damaged else 0) | (ROUND_FIELD if field else 0)
+        parts = [RECORD.pack(ROUND, time.time() if now is None else now),
+                 ROUND_FIELDS.pack(seed, screen_size[0], screen_size[1], flags, difficulty or 0, len(codes))]
+        for code_type, code in zip(code_types, codes):
+            parts.append(pack_string(code_type))
+            parts.append(pack_string(code))
+        self.file.write(b''.join(parts))
+        self.file.flush()
+
+    def event(self, event, now=None):
+        now = time.time() if now is None else now
+        if event.type == pygame.KEYDOWN:
+            self.file.write(RECORD.pack(KEY, now) + KEY_FIELDS.pack(event.key & 0xFFFFFFFF, event.mod & 0xFFFF)
+                            + pack_string(event.unicode))
+            if event.key == pygame.K_RETURN:
+                self.file.flush()  # Answers and names are the moments worth keeping
+        elif event.type == pygame.QUIT:
+            self.file.write(RECORD.pack(QUIT, now))
+
+    def close(self):
+        self.file.close()
+
+
+def read_trace(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, version, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} trace")
+    offset = HEADER.size
+
+    def string():
+        nonlocal offset
+        length = data[offset]
+        text = data[offset + 1:offset + 1 + length].decode('utf-8')
+        offset += 1 + length
+        return text
+
+    records = []
+    try:
+        while offset < len(data):
+            kind, now = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            if kind == ROUND:
+                seed, width, height, flags, difficulty, count = ROUND_FIELDS.unpack_from(data, offset)
+                offset += ROUND_FIELDS.size
+                pairs = [(string(), string()) for _ in range(count)]
+                records.append(RoundRecord(now, seed, (width, height), bool(flags & ROUND_DAMAGED), difficulty or None,
+                                           [code_type for code_type, _ in pairs], [code for _, code in pairs],
+                                           bool(flags & ROUND_FIELD)))
+            elif kind == KEY:
+                key, mod = KEY_FIELDS.unpack_from(data, offset)
+                offset += KEY_FIELDS.size
+                records.append(KeyRecord(now, key, mod, string()))
+            elif kind == QUIT:
+                records.append(QuitRecord(now))
+            else:
+                raise ValueError(f"unknown record type {kind} at byte {offset - RECORD.size}")
+    except (struct.error, IndexError, UnicodeDecodeError):
+        pass  # Cut off by a crash; everything before it is still good
+    return records
+
+
+class ReplayLeaderboard:
+    # Collects the runs a replay finishes instead of storing them
+    def __init__(self):
+        self.runs = []
+
+    def add(self, name, time_taken):
+        self.runs.append({"name": name, "time": time_taken})
+
+    def top(self, count=10):
+        return sorted(self.runs, key=lambda run: run["time"])[:count]
+
+
+def rebuild_round(record):
+    import codegen
+    start = time.perf_counter()
+    built = codegen.build_round(record.screen_size, len(record.codes), record.damaged, seed=record.seed,
+                                difficulty=record.difficulty, code_types=record.code_types, field=record.field)
+    elapsed = (time.perf_counter() - start) * 1000
+    if built["codes"] != record.codes:
+        raise ValueError(f"round with seed {record.seed} does not rebuild to the recorded codes")
+    return elapsed
+
+def replay(path, rebuild=False):
+    # Runs a trace through Game and returns what it produced
+    from game import Game, GAME_RUNNING
+
+    records = read_trace(path)
+    rounds = deque(record for record in records if isinstance(record, RoundRecord))
+    clock = [records[0].time if records else 0.0]
+    build_ms = []
+    keys_per_round = []
+
+    def next_round():
+        # Providers record the round as they hand it over, so its time is
+        # the start time the live game used
+        record = rounds.popleft()
+        clock[0] = record.time
+        if rebuild and all(name != 'picture' for name in record.code_types):
+            build_ms.append(rebuild_round(record))
+        keys_per_round.append([])
+        count = len(record.codes)
+        return record.codes, [(0, 0)] * count, [None] * count
+
+    pygame.font.init()
+    font = pygame.font.Font(None, 32)
+    leaderboard = ReplayLeaderboard()
+    # A session is either field rounds or single-code rounds throughout
+    field = any(record.field for record in rounds)
+    game = Game((1920, 1080), font, font, None, next_round, leaderboard, clock=lambda: clock[0], field=field)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Game prints every answer
+        for record in records:
+            clock[0] = record.time
+            if isinstance(record, KeyRecord):
+                if game.game_state == GAME_RUNNING:
+                    keys_per_round[-1].append(record.time)
+                game.handle_event(pygame.event.Event(pygame.KEYDOWN, key=record.key, mod=record.mod,
+                                                     unicode=record.unicode))
+            elif isinstance(record, QuitRecord):
+                game.handle_event(pygame.event.Event(pygame.QUIT))
+    elapsed = time.perf_counter() - start
+
+    gaps = [b - a for times in keys_per_round for a, b in zip(times, times[1:])]
+    return {
+        "events": len(records),
+        "replay_s": elapsed,
+        "runs": leaderboard.runs,
+        "rounds_started": len(keys_per_round),
+        "keystrokes": sum(len(times) for times in keys_per_round),
+        "fastest_gap_ms": min(gaps) * 1000 if gaps else None,
+        "build_ms": build_ms,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run a recorded session headless")
+    parser.add_argument("trace")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild every round from its seed and time it")
+    args = parser.parse_args()
+    result = replay(args.trace, args.rebuild)
+    print(f"{result['events']} events replayed in {result['replay_s'] * 1000:.1f} ms, "
+          f"{result['rounds_started']} rounds, {result['keystrokes']} keystrokes in play")
+    if result["fastest_gap_ms"] is not None:
+        print(f"fastest gap between keystrokes: {result['fastest_gap_ms']:.1f} ms")
+    for run in result["runs"]:
+        print(f"finished: {run['name']} - {run['time']:.2f} seconds")
+    if result["build_ms"]:
+        build_ms = sorted(result["build_ms"])
+        print(f"round rebuild: median {build_ms[len(build_ms) // 2]:.1f} ms, max {build_ms[-1]:.1f} ms")
+
+if __name__ == "__main__":
+    main()
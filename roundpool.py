@@ -0,0 +1,56 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import codegen
+
+# Producer stage for game rounds. While one player is typing, the next round's
+# codes, positions and PIL images are built in the background, so reset_game
+# only has to pick up a finished round and turn it into surfaces.
+
+ROUNDS_AHEAD = 1  # Rounds kept ready per damaged setting
+
+
+def make_executor(workers=None):
+    # The game scripts only start up in main(), so spawned children (Windows,
+    # macOS) can import them safely and every platform gets real processes
+    return ProcessPoolExecutor(max_workers=workers, initializer=codegen.seed_worker)
+
+
+class RoundPool:
+    def __init__(self, screen_size, code_count=codegen.CODE_COUNT, rounds_ahead=ROUNDS_AHEAD, workers=None,
+                 difficulty=None, field=False):
+        self.screen_size = screen_size
+        self.code_count = code_count
+        self.difficulty = difficulty  # Calibrated level (see calibrate.py), or None
+        self.field = field  # All codes on screen at once
+        if field:
+            codegen.check_field(screen_size, code_count)  # Fails here at start-up rather than in every round
+        self.rounds_ahead = rounds_ahead
+        self.executor = make_executor(workers)
+        self.pending = {}  # damaged_codes -> deque of futures
+
+    def _submit(self, damaged_codes):
+        return self.executor.submit(codegen.build_round, self.screen_size, self.code_count, damaged_codes,
+                                    difficulty=self.difficulty, field=self.field)
+
+    def prime(self, damaged_codes=False):
+        queue = self.pending.setdefault(damaged_codes, deque())
+        while len(queue) < self.rounds_ahead:
+            queue.append(self._submit(damaged_codes))
+
+    def ready(self, damaged_codes=False):
+        queue = self.pending.get(damaged_codes)
+        return bool(queue) and queue[0].done()
+
+    def take(self, damaged_codes=False):
+        # Blocks only if the producer has fallen behind (e.g. the very first round)
+        self.prime(damaged_codes)
+        future = self.pending[damaged_codes].popleft()
+        self.prime(damaged_codes)  # Start on the round after this one right away
+        return future.result()
+
+    def close(self):
+        for queue in self.pending.values():
+            for future in queue:
+                future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
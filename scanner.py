@@ -0,0 +1,49 @@
+import re
+import time
+
+import pygame
+
+# Barcode scanners type like a keyboard and end every code with Enter. The
+# parser collects the keystrokes back into payloads. A pause longer than
+# SCAN_TIMEOUT inside a payload means it was cut off, and the partial text is
+# dropped. Text that is only digits so far may be someone typing a number by
+# hand, so it gets MANUAL_TIMEOUT between keys instead. With a pattern, every
+# complete match in the text before Enter is a payload, so two codes that ran
+# together (a lost Enter, two scanners at once) both still come out.
+
+SCAN_TIMEOUT = 0.5
+MANUAL_TIMEOUT = 10.0
+ENTER_KEYS = (pygame.K_RETURN, pygame.K_KP_ENTER)
+
+
+class ScanParser:
+    def __init__(self, pattern=None, timeout=SCAN_TIMEOUT, manual_timeout=MANUAL_TIMEOUT, clock=time.monotonic):
+        self.pattern = re.compile(pattern) if pattern else None
+        self.timeout = timeout
+        self.manual_timeout = manual_timeout
+        self.clock = clock
+        self.buffer = []
+        self.last_key = 0.0
+
+    def feed(self, event):
+        # Payloads completed by this event, usually none
+        if event.type != pygame.KEYDOWN:
+            return []
+        now = self.clock()
+        if self.buffer:
+            manual = all(char.isdigit() for char in self.buffer)
+            if now - self.last_key > (self.manual_timeout if manual else self.timeout):
+                self.buffer = []
+        self.last_key = now
+        if event.key in ENTER_KEYS:
+            text = ''.join(self.buffer).strip().upper()
+            self.buffer = []
+            if not text:
+                return []
+            return self.pattern.findall(text) if self.pattern else [text]
+        if event.key == pygame.K_BACKSPACE:
+            if self.buffer:
+                self.buffer.pop()
+        elif event.unicode and event.unicode.isprintable():
+            self.buffer.append(event.unicode)
+        return []
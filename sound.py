@@ -1,9 +1,7 @@
-from pydub import AudioSegment
-from pydub.generators import Sine
+from synth import FLAT, sequence, write_wav
 
-# Create a sine wave sound
-sine_wave = Sine(440).to_audio_segment(duration=500)  # 440 Hz for 500 ms
-sine_wave = sine_wave + Sine(880).to_audio_segment(duration=500)  # 880 Hz for 500 ms
+# Create a sine wave sound: 440 Hz for 500 ms, then 880 Hz for 500 ms
+success = sequence([(440.0, 0.5), (880.0, 0.5)], FLAT, volume=1.0)
 
 # Export the sound to a wav file
-sine_wave.export("success.wav", format="wav")
+write_wav("success.wav", success)
@@ -0,0 +1,77 @@
+import pygame
+
+# PIL / NumPy to pygame conversion without the intermediate copies.
+#
+# The old pil_to_surface copied every image three times (tobytes, frombytes +
+# convert, tobytes again) before pygame.image.fromstring made a fourth copy.
+# Here an RGBA PIL image costs one tobytes() that pygame then shares through
+# frombuffer, and a C-contiguous HxWx4 uint8 array is shared without any copy.
+# The only remaining pixel copy is the one into the display pixel format,
+# which every blit would otherwise pay again.
+
+POOL_BUCKET = 16  # Pooled surfaces are rounded up to multiples of this size
+
+
+def _display_ready():
+    return pygame.display.get_init() and pygame.display.get_surface() is not None
+
+def _finish(source, pool):
+    if pool is not None:
+        return pool.fill(source)
+    if _display_ready():
+        return source.convert_alpha()
+    return source.copy()  # No display yet, detach from the shared buffer anyway
+
+def pil_to_surface(pil_image, pool=None):
+    if pil_image.mode != "RGBA":
+        pil_image = pil_image.convert("RGBA")
+    source = pygame.image.frombuffer(pil_image.tobytes(), pil_image.size, "RGBA")
+    return _finish(source, pool)
+
+def array_to_surface(array, pool=None):
+    # array is height x width x 4 (RGBA), as returned by np.asarray(pil_image)
+    height, width = array.shape[:2]
+    if not array.flags["C_CONTIGUOUS"]:
+        array = array.copy(order="C")
+    source = pygame.image.frombuffer(array, (width, height), "RGBA")
+    return _finish(source, pool)
+
+
+class SurfacePool:
+    # Reuses display-format surfaces between rounds. Sizes are bucketed so that
+    # rotated codes of slightly different size still share surfaces; callers
+    # get a subsurface of exactly the requested size.
+
+    def __init__(self, bucket=POOL_BUCKET):
+        self.bucket = bucket
+        self.free = {}
+        self.allocated = 0
+
+    def _bucket_size(self, size):
+        width, height = size
+        return (-(-width // self.bucket) * self.bucket, -(-height // self.bucket) * self.bucket)
+
+    def acquire(self, size):
+        bucket_size = self._bucket_size(size)
+        free = self.free.get(bucket_size)
+        if free:
+            surface = free.pop()
+        else:
+            surface = pygame.Surface(bucket_size, pygame.SRCALPHA)
+            if _display_ready():
+                surface = surface.convert_alpha()
+            self.allocated += 1
+        return surface.subsurface((0, 0) + tuple(size))
+
+    def fill(self, source):
+        surface = self.acquire(source.get_size())
+        # With blending switched off the blit is a straight copy, alpha included,
+        # that converts to the display pixel format on the way
+        source.set_alpha(None)
+        surface.blit(source, (0, 0))
+        return surface
+
+    def release(self, surfaces):
+        for surface in surfaces:
+            parent = surface.get_parent() or surface
+            self.free.setdefault(parent.get_size(), []).append(parent)
@@ -0,0 +1,109 @@
+import time
+
+# Registry of the code symbologies a round can use. Each entry knows how to
+# turn the random digits into a payload the scanner will read back, how to
+# validate that payload and how to encode it. It also keeps live cost
+# figures, so the round builder can stay inside a time budget.
+#
+# Encoders are registered by codegen.py. Other modules can add their own with
+# register(); an entry whose available() check fails is skipped.
+
+DEFAULT_COST_MS = 20.0  # Assumed encode time until a symbology has been measured
+COST_SMOOTHING = 0.2  # Weight of the newest sample in the moving averages
+
+
+class Symbology:
+    def __init__(self, name, encode, size, weight=10, flip=0, rotate=True,
+                 validate=None, payload=None, available=None):
+        self.name = name
+        self.encode = encode  # payload -> clean RGBA PIL image
+        self.size = size  # (width, height) the clean image is resized to
+        self.weight = weight  # Relative chance of being picked for a round
+        self.flip = flip  # damage.FLIP_* applied to damaged codes
+        self.rotate = rotate
+        self.validate = validate or (lambda data: bool(data))
+        self.payload = payload or (lambda digits: digits)
+        self.available = available or (lambda: True)
+        self.encodes = 0
+        self.encode_ms = None  # Moving average of the encode time
+        self.image_bytes = None  # Moving average of the clean image size
+
+    def record(self, elapsed_ms, image):
+        image_bytes = image.width * image.height * len(image.getbands())
+        if self.encode_ms is None:
+            self.encode_ms = elapsed_ms
+            self.image_bytes = image_bytes
+        else:
+            self.encode_ms += COST_SMOOTHING * (elapsed_ms - self.encode_ms)
+            self.image_bytes += COST_SMOOTHING * (image_bytes - self.image_bytes)
+        self.encodes += 1
+
+    def measured_encode(self, data):
+        if not self.validate(data):
+            raise ValueError(f"Payload {data!r} is not valid for {self.name}")
+        start = time.perf_counter()
+        image = self.encode(data)
+        self.record((time.perf_counter() - start) * 1000, image)
+        return image
+
+    def expected_ms(self):
+        return DEFAULT_COST_MS if self.encode_ms is None else self.encode_ms
+
+
+registry = {}
+
+
+def register(name, encode, size, **options):
+    registry[name] = Symbology(name, encode, size, **options)
+    return registry[name]
+
+def get(name):
+    return registry[name]
+
+def available_symbologies():
+    usable = []
+    for symbology in registry.values():
+        try:
+            if symbology.available():
+                usable.append(symbology)
+        except Exception as e:
+            print(f"Symbology '{symbology.name}' is not available: {e}")
+    return usable
+
+def choose(count, rng, budget_ms=None, names=None):
+    # Weighted random pick of count symbologies. With a budget, each pick is
+    # limited to the types whose expected encode time still fits, falling back
+    # to the cheapest one once nothing does.
+    candidates = [s for s in available_symbologies() if names is None or s.name in names]
+    if not candidates:
+        raise ValueError("No symbologies are available")
+    chosen = []
+    remaining = budget_ms
+    for _ in range(count):
+        options = candidates
+        if remaining is not None:
+            options = [s for s in candidates if s.expected_ms() <= remaining]
+            if not options:
+                options = [min(candidates, key=lambda s: s.expected_ms())]
+        weights = [s.weight for s in options]
+        pick = options[rng.choice(len(options), p=[w / sum(weights) for w in weights])]
+        if remaining is not None:
+            remaining -= pick.expected_ms()
+        chosen.append(pick)
+    return chosen
+
+def cost_report():
+    return {s.name: {"encodes": s.encodes, "encode_ms": s.encode_ms, "image_bytes": s.image_bytes}
+            for s in registry.values()}
+
+def ean13_check_digit(digits):
+    # Weights alternate 1, 3 starting from the leftmost of the 12 digits
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+def ean13_payload(digits):
+    digits = digits[:12]
+    return digits + ean13_check_digit(digits)
+
+def is_ean13(data):
+    return len(data) == 13 and data.isdigit() and data[-1] == ean13_check_digit(data[:12])
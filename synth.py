@@ -0,0 +1,152 @@
+import argparse
+import os
+import time
+import wave
+from collections import namedtuple
+
+import numpy as np
+
+# Tone and chord synthesis in NumPy. All notes of the same length are rendered
+# as one array operation (notes x chord tones x samples), with an ADSR
+# envelope per note, so a whole set of cues costs a few array passes instead
+# of one Python loop per sample or per file. The results are float arrays in
+# -1..1; to_pcm() turns them into the int16 frames pygame.sndarray and WAV
+# files take.
+#
+#   python synth.py --output sounds    # the 24 keys and the game cues as WAV
+#   python synth.py --check            # sanity check of the ADSR envelopes
+
+SAMPLE_RATE = 44100
+
+Envelope = namedtuple('Envelope', 'attack decay sustain release')  # Seconds, except sustain (level 0-1)
+
+FLAT = Envelope(0.005, 0.0, 1.0, 0.005)  # Just enough ramp to avoid clicks
+PLUCK = Envelope(0.005, 0.15, 0.5, 0.3)
+BUZZ = Envelope(0.01, 0.05, 0.8, 0.05)
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+KEY_COUNT = 24
+KEY_ROOT = 'C4'  # KEY01; the others go up a semitone each
+
+
+def note_frequency(note):
+    # 'A4', 'C#5', a MIDI number or a frequency in Hz (float)
+    if isinstance(note, float):
+        return note
+    if isinstance(note, str):
+        name, octave = note[:-1], int(note[-1])
+        note = NOTE_NAMES.index(name) + 12 * (octave + 1)
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+def envelopes(envelope_list, duration, sample_rate=SAMPLE_RATE):
+    # (notes x samples) gains for notes of the same duration: the attack,
+    # decay and sustain curve, with its last release seconds faded to 0 from
+    # whatever level it had reached (a note shorter than its release fades
+    # over its whole length)
+    t = np.arange(int(round(duration * sample_rate)), dtype=np.float32) / sample_rate
+    attack, decay, sustain, release = (np.array(values, dtype=np.float32)[:, None]
+                                       for values in zip(*envelope_list))
+    step = 1.0 / sample_rate  # Zero-length stages become a one-sample ramp
+    attack, decay = np.maximum(attack, step), np.maximum(decay, step)
+    release = np.clip(release, step, max(duration, step))
+    rise = t / attack
+    fall = np.maximum(1.0 - (1.0 - sustain) * (t - attack) / decay, sustain)
+    fade = np.clip((duration - t) / release, 0.0, 1.0)
+    return np.clip(np.minimum(rise, fall), 0.0, 1.0) * fade
+
+def tones(chords, duration, envelope=PLUCK, volume=0.8, sample_rate=SAMPLE_RATE):
+    # One row per chord (a note or a list of notes), all of one duration,
+    # rendered in a single pass. envelope is one Envelope or one per chord.
+    chords = [chord if isinstance(chord, (list, tuple)) else [chord] for chord in chords]
+    width = max(len(chord) for chord in chords)
+    frequencies = np.zeros((len(chords), width), dtype=np.float32)
+    for row, chord in enumerate(chords):
+        frequencies[row, :len(chord)] = [note_frequency(note) for note in chord]
+    # Padding tones have frequency 0, sin(0) is silent
+    t = np.arange(int(round(duration * sample_rate)), dtype=np.float32) / sample_rate
+    mixed = np.sin((2 * np.pi) * frequencies[:, :, None] * t).sum(axis=1)
+    mixed /= np.array([len(chord) for chord in chords], dtype=np.float32)[:, None]
+    envelope_list = [envelope] * len(chords) if isinstance(envelope, Envelope) else envelope
+    return mixed * envelopes(envelope_list, duration, sample_rate) * volume
+
+def sequence(steps, envelope=PLUCK, volume=0.8, sample_rate=SAMPLE_RATE):
+    # One track from (chord, duration) steps played one after the other.
+    # Steps of equal duration are rendered together.
+    rows = {}
+    by_duration = {}
+    for index, (_, duration) in enumerate(steps):
+        by_duration.setdefault(duration, []).append(index)
+    for duration, indices in by_duration.items():
+        rendered = tones([steps[i][0] for i in indices], duration, envelope, volume, sample_rate)
+        rows.update(zip(indices, rendered))
+    return np.concatenate([rows[index] for index in range(len(steps))])
+
+def to_pcm(samples, channels=2):
+    # int16 frames, (samples,) for mono or (samples, channels), C-contiguous
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    if channels == 1:
+        return pcm
+    return np.ascontiguousarray(np.repeat(pcm[:, None], channels, axis=1))
+
+def make_sound(samples):
+    # A pygame Sound in the mixer's format; the mixer must be initialised and
+    # the samples rendered at its frequency
+    import pygame
+    _, _, channels = pygame.mixer.get_init()
+    return pygame.sndarray.make_sound(to_pcm(samples, channels))
+
+def write_wav(path, samples, sample_rate=SAMPLE_RATE, channels=1):
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(to_pcm(samples, channels).tobytes())
+
+def write_wavs(named_samples, directory, sample_rate=SAMPLE_RATE):
+    os.makedirs(directory, exist_ok=True)
+    for name, samples in named_samples.items():
+        write_wav(os.path.join(directory, name + '.wav'), samples, sample_rate)
+
+
+def key_notes(count=KEY_COUNT, root=KEY_ROOT):
+    first = NOTE_NAMES.index(root[:-1]) + 12 * (int(root[-1]) + 1)
+    return list(range(first, first + count))
+
+def game_cues(sample_rate=SAMPLE_RATE):
+    # name -> samples for KEY01..KEY24 and the game's feedback sounds
+    cues = dict(zip([f"KEY{i + 1:02d}" for i in range(KEY_COUNT)],
+                    tones(key_notes(), 1.0, PLUCK, sample_rate=sample_rate)))
+    cues["success"] = sequence([('A4', 0.25), (['A5', 'C#6', 'E6'], 0.25)], FLAT, sample_rate=sample_rate)
+    cues["error"] = tones([[110.0, 116.5]], 0.4, BUZZ, sample_rate=sample_rate)[0]
+    return cues
+
+def check_envelopes(sample_rate=SAMPLE_RATE):
+    # Peaks of envelopes that are easy to get wrong; raises AssertionError
+    checks = [
+        ("AD envelope (sustain 0)", Envelope(0.005, 0.2, 0.0, 0.1), 1.0),
+        ("note shorter than attack + decay + release", Envelope(0.01, 0.1, 0.7, 0.5), 0.3),
+        ("flat", FLAT, 0.5),
+    ]
+    for label, envelope, duration in checks:
+        peak = float(np.abs(envelopes([envelope], duration, sample_rate)).max())
+        assert peak > 0.9, f"{label}: envelope peaks at {peak:.2f}"
+        print(f"{label}: peak {peak:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the key notes and game cues as WAV files")
+    parser.add_argument("--output", default="sounds")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--check", action="store_true", help="only check the envelopes and exit")
+    args = parser.parse_args()
+    if args.check:
+        check_envelopes(args.sample_rate)
+        return
+    start = time.perf_counter()
+    cues = game_cues(args.sample_rate)
+    rendered = time.perf_counter()
+    write_wavs(cues, args.output, args.sample_rate)
+    print(f"{len(cues)} cues rendered in {(rendered - start) * 1000:.1f} ms, "
+          f"written to {args.output} in {(time.perf_counter() - rendered) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
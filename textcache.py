@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+import pygame
+
+# Cache for font.render() results. Surfaces are keyed by (font, text, colour,
+# antialias) and evicted least-recently-used. Text that grows one character at
+# a time (what the player is typing) is composed from the previous string and
+# a cached glyph instead of being rendered from scratch.
+
+MAX_ENTRIES = 512
+
+
+class TextCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.glyphs = {}  # Single characters are few, they are never evicted
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, key, surface):
+        if pygame.display.get_init() and pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self.surfaces[key] = surface
+        while len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def _lookup(self, key):
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return surface
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self._lookup(key)
+        if surface is None:
+            surface = self._store(key, font.render(text, antialias, color))
+        return surface
+
+    def prerender(self, font, texts, color, antialias=True):
+        for text in texts:
+            self.render(font, text, color, antialias)
+
+    def glyph(self, font, char, color, antialias=True):
+        key = (font, char, tuple(color), antialias)
+        surface = self.glyphs.get(key)
+        if surface is None:
+            surface = self.glyphs[key] = font.render(char, antialias, color)
+        return surface
+
+    def render_input(self, font, text, color, antialias=True):
+        # For text that changes by one character at the end: reuse the surface
+        # of text[:-1] and add the last glyph. Backspacing hits the cache.
+        key = (font, text, tuple(color), antialias)
+        surface = self._lookup(key)
+        if surface is not None:
+            return surface
+        prefix = self.surfaces.get((font, text[:-1], tuple(color), antialias)) if len(text) > 1 else None
+        if prefix is None:
+            return self._store(key, font.render(text, antialias, color))
+        glyph = self.glyph(font, text[-1], color, antialias)
+        # Advance from the font, not the prefix surface, so trailing spaces count
+        x = font.size(text[:-1])[0]
+        surface = pygame.Surface((max(x + glyph.get_width(), prefix.get_width()), font.get_height()), pygame.SRCALPHA)
+        surface.blit(prefix, (0, 0))
+        surface.blit(glyph, (x, 0))
+        return self._store(key, surface)